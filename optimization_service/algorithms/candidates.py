@@ -0,0 +1,571 @@
+#!/usr/bin/env python3
+"""
+Columnar candidate-shift table shared by the optimization algorithms.
+"""
+
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from models.optimization_models import ConstraintType, ObjectiveType
+
+# One row per candidate shift: day offset into the date range, position of the
+# job source in the job_sources mapping, start minute since midnight and
+# duration in minutes.
+CANDIDATE_DTYPE = np.dtype([
+    ('day', np.int16),
+    ('job', np.int8),
+    ('start', np.int16),
+    ('duration', np.int16)
+])
+
+# One row per existing shift inside the date range: day offset, start and end
+# minute (an end at or before the start runs to midnight), worked hours after
+# the break and the income they earn.
+EXISTING_SHIFT_DTYPE = np.dtype([
+    ('day', np.int16),
+    ('start', np.int16),
+    ('end', np.int16),
+    ('hours', np.float64),
+    ('income', np.float64)
+])
+
+# Default shift catalog for job sources without a shift_template: 4, 6 and 8
+# hour shifts starting on the hour from 8 AM and ending by 10 PM.
+SHIFT_DURATIONS_HOURS = (4, 6, 8)
+EARLIEST_START_HOUR = 8
+LATEST_END_HOUR = 22
+
+# Start-time grid of the standard model, and the finer grids of multigrid refinement
+COARSE_STEP_MINUTES = 60
+REFINEMENT_STEPS_MINUTES = (30, 15)
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def job_shift_templates(job_sources: Dict[str, Any]) -> List[Tuple[np.ndarray, int, int, int]]:
+    """
+    Shift catalog of each job source, in job order.
+    
+    Each entry holds the durations in minutes, the earliest start and latest
+    end minute and the finest start interval the employer allows.
+    """
+    templates = []
+    for job_source in job_sources.values():
+        template = getattr(job_source, 'shift_template', None)
+        if template is None:
+            templates.append((
+                np.array(SHIFT_DURATIONS_HOURS) * 60,
+                EARLIEST_START_HOUR * 60,
+                LATEST_END_HOUR * 60,
+                REFINEMENT_STEPS_MINUTES[-1]
+            ))
+        else:
+            templates.append((
+                np.round(np.array(template.durations) * 60).astype(int),
+                time_to_minutes(template.earliest_start),
+                time_to_minutes(template.latest_end),
+                template.start_interval_minutes
+            ))
+    return templates
+
+
+def build_candidate_table(
+    num_days: int,
+    job_sources: Dict[str, Any],
+    step_minutes: int = COARSE_STEP_MINUTES
+) -> np.ndarray:
+    """
+    Enumerate every (day, job, start, duration) candidate by broadcasting.
+    
+    Starts lie on a grid of step_minutes (or the job's own start interval,
+    whichever is coarser) counted from the job's earliest start.
+    """
+    job_templates = []
+    for job, (durations, earliest, latest_end, interval) in enumerate(job_shift_templates(job_sources)):
+        starts = np.arange(earliest, latest_end, max(step_minutes, interval))
+        duration_grid, start_grid = np.meshgrid(durations, starts, indexing='ij')
+        fits = start_grid + duration_grid <= latest_end
+        job_templates.append((np.full(fits.sum(), job), start_grid[fits], duration_grid[fits]))
+    
+    if not job_templates:
+        return np.zeros(0, dtype=CANDIDATE_DTYPE)
+    
+    template_jobs, template_starts, template_durations = (np.concatenate(column) for column in zip(*job_templates))
+    day_grid, template_grid = np.meshgrid(np.arange(num_days), np.arange(len(template_starts)), indexing='ij')
+    
+    candidates = np.empty(day_grid.size, dtype=CANDIDATE_DTYPE)
+    candidates['day'] = day_grid.ravel()
+    candidates['job'] = template_jobs[template_grid.ravel()]
+    candidates['start'] = template_starts[template_grid.ravel()]
+    candidates['duration'] = template_durations[template_grid.ravel()]
+    return candidates
+
+
+def refine_candidates(
+    selected: np.ndarray,
+    job_sources: Dict[str, Any],
+    step_minutes: int,
+    window_minutes: int
+) -> np.ndarray:
+    """
+    Finer-grid candidates in a window around already selected shifts.
+    
+    For every selected shift, each of the job's durations is tried with its
+    start, or its end, within window_minutes of the selected shift's start
+    or end, on a step_minutes grid (or the job's start interval, if
+    coarser), on the same day and job. Anchoring on both ends lets a longer
+    or shorter shift keep one boundary of the coarse choice. The selected
+    shifts themselves are always included.
+    """
+    refined = [selected]
+    for job, (durations, earliest, latest_end, interval) in enumerate(job_shift_templates(job_sources)):
+        rows = selected[selected['job'] == job]
+        if len(rows) == 0:
+            continue
+        
+        step = max(step_minutes, interval)
+        offsets = np.arange(-(window_minutes // step) * step, window_minutes + 1, step)
+        starts = rows['start'].astype(int)[:, np.newaxis, np.newaxis] + offsets[np.newaxis, :, np.newaxis]
+        ends = starts + rows['duration'].astype(int)[:, np.newaxis, np.newaxis]
+        
+        # Start-anchored and end-anchored variants, stacked along the offset axis
+        start_grid = np.concatenate([
+            np.broadcast_to(starts, starts.shape[:2] + (len(durations),)),
+            ends - durations[np.newaxis, np.newaxis, :]
+        ], axis=1)
+        duration_grid = np.broadcast_to(durations[np.newaxis, np.newaxis, :], start_grid.shape)
+        day_grid = np.broadcast_to(rows['day'][:, np.newaxis, np.newaxis], start_grid.shape)
+        
+        fits = (start_grid >= earliest) & (start_grid + duration_grid <= latest_end) & ((start_grid - earliest) % step == 0)
+        
+        window = np.empty(fits.sum(), dtype=CANDIDATE_DTYPE)
+        window['day'] = day_grid[fits]
+        window['job'] = job
+        window['start'] = start_grid[fits]
+        window['duration'] = duration_grid[fits]
+        refined.append(window)
+    
+    # np.unique also sorts day-major, as the constraint builders expect
+    return np.unique(np.concatenate(refined))
+
+
+def build_problem_candidates(
+    problem_data: Dict[str, Any],
+    integral: bool = False
+) -> Tuple[np.ndarray, Dict[str, int]]:
+    """Presolved candidate table for a problem, with the reduction statistics."""
+    candidates = build_candidate_table(len(problem_data['date_range']), problem_data['job_sources'])
+    return presolve_candidates(candidates, problem_data, integral)
+
+
+def presolve_candidates(
+    candidates: np.ndarray,
+    problem_data: Dict[str, Any],
+    integral: bool = False
+) -> Tuple[np.ndarray, Dict[str, int]]:
+    """
+    Drop candidates that can never be part of an optimal schedule.
+    
+    Removed, in order:
+    - shifts outside every availability window;
+    - shifts overlapping an existing shift;
+    - shifts longer than what is left of the daily hour cap after the
+      existing shifts of their day;
+    - under MAXIMIZE_INCOME without per-job limits, shifts whose exact
+      (day, start, duration) window is also offered by a better-paying job.
+      Both use the same hours, and the better one earns more income per hour,
+      so it can always replace the worse one (scaled down in the relaxation
+      if the fuyou budget binds). In integral models with a fuyou budget a
+      higher income may not fit, so only equal-rate duplicates are dropped
+      there.
+    
+    Returns the remaining candidates and the count removed by each rule.
+    """
+    date_range = problem_data['date_range']
+    job_sources = problem_data['job_sources']
+    constraints_dict = problem_data['constraints']
+    stats = {'generated': len(candidates)}
+    
+    candidates = prune_unavailable(candidates, date_range, job_sources, problem_data.get('availability', []))
+    stats['unavailable'] = stats['generated'] - len(candidates)
+    
+    existing = existing_shift_table(problem_data.get('existing_shifts', []), date_range)
+    free = ~occupied_mask(candidates, existing)
+    stats['occupied'] = int((~free).sum())
+    candidates = candidates[free]
+    
+    daily_hours = residual_limits(constraints_dict, date_range, existing)['daily_hours']
+    within_cap = candidates['duration'] <= daily_hours[candidates['day']] * 60 if daily_hours is not None else np.ones(len(candidates), dtype=bool)
+    stats['over_daily_cap'] = int((~within_cap).sum())
+    candidates = candidates[within_cap]
+    
+    dominated = np.zeros(len(candidates), dtype=bool)
+    if (
+        len(candidates)
+        and problem_data.get('objective') == ObjectiveType.MAXIMIZE_INCOME
+        and ConstraintType.JOB_SOURCE_LIMIT not in constraints_dict
+    ):
+        rates = job_hourly_rates(job_sources)[candidates['job']]
+        
+        # Within each (day, start, duration) window the best-paying job sorts first
+        order = np.lexsort((candidates['job'], -rates, candidates['duration'], candidates['start'], candidates['day']))
+        window_keys = candidates[['day', 'start', 'duration']][order]
+        first_in_window = np.ones(len(order), dtype=bool)
+        first_in_window[1:] = window_keys[1:] != window_keys[:-1]
+        
+        dominated[order] = ~first_in_window
+        if integral and ConstraintType.FUYOU_LIMIT in constraints_dict:
+            best_rates = np.maximum.reduceat(rates[order], np.flatnonzero(first_in_window))
+            window_best = np.repeat(best_rates, np.diff(np.append(np.flatnonzero(first_in_window), len(order))))
+            dominated[order] &= rates[order] == window_best
+    
+    stats['dominated'] = int(dominated.sum())
+    candidates = candidates[~dominated]
+    stats['remaining'] = len(candidates)
+    return candidates, stats
+
+
+def availability_windows(availability: List[Any], job_sources: Dict[str, Any]) -> Optional[np.ndarray]:
+    """
+    Minute-level availability per weekday (0=Sunday) and job, shape (7, jobs, 1440).
+    
+    Returns None when no availability is declared, meaning no restriction.
+    A job with its own available slots may only work inside them; other jobs
+    use the general slots (those without job_source_id). When no available
+    slot is declared at all, every minute starts out available. Slots with
+    is_available=False are blackouts, for one job or for all of them.
+    """
+    if not availability:
+        return None
+    
+    job_ids = list(job_sources)
+    windows = np.zeros((7, len(job_ids), MINUTES_PER_DAY), dtype=bool)
+    general = np.zeros((7, MINUTES_PER_DAY), dtype=bool)
+    has_own_slots = np.zeros(len(job_ids), dtype=bool)
+    
+    for slot in availability:
+        if not slot.is_available:
+            continue
+        start, end = slot_minutes(slot)
+        if slot.job_source_id is None:
+            general[slot.day_of_week, start:end] = True
+        elif slot.job_source_id in job_ids:
+            job = job_ids.index(slot.job_source_id)
+            windows[slot.day_of_week, job, start:end] = True
+            has_own_slots[job] = True
+    
+    if not general.any() and not has_own_slots.any():
+        general[:] = True
+    windows[:, ~has_own_slots, :] = general[:, np.newaxis, :]
+    
+    for slot in availability:
+        if slot.is_available:
+            continue
+        start, end = slot_minutes(slot)
+        if slot.job_source_id is None:
+            windows[slot.day_of_week, :, start:end] = False
+        elif slot.job_source_id in job_ids:
+            windows[slot.day_of_week, job_ids.index(slot.job_source_id), start:end] = False
+    
+    return windows
+
+
+def prune_unavailable(
+    candidates: np.ndarray,
+    date_range: pd.DatetimeIndex,
+    job_sources: Dict[str, Any],
+    availability: List[Any]
+) -> np.ndarray:
+    """Keep only candidates that lie entirely inside an availability window."""
+    windows = availability_windows(availability, job_sources)
+    if windows is None or len(candidates) == 0:
+        return candidates
+    
+    # Prefix sums over minutes turn each coverage check into two lookups
+    covered = np.zeros(windows.shape[:2] + (MINUTES_PER_DAY + 1,), dtype=np.int32)
+    np.cumsum(windows, axis=2, out=covered[:, :, 1:])
+    
+    weekdays = weekday_index(date_range)[candidates['day']]
+    jobs = candidates['job']
+    starts = candidates['start'].astype(np.intp)
+    ends = starts + candidates['duration']
+    
+    available = covered[weekdays, jobs, ends] - covered[weekdays, jobs, starts] == candidates['duration']
+    return candidates[available]
+
+
+def existing_shift_table(existing_shifts: List[Any], date_range: pd.DatetimeIndex) -> np.ndarray:
+    """Existing shifts that fall inside the date range, as an EXISTING_SHIFT_DTYPE table."""
+    first_date = date_range[0].date()
+    rows = []
+    for shift in existing_shifts:
+        day = (shift.date - first_date).days
+        if not 0 <= day < len(date_range):
+            continue
+        start = time_to_minutes(shift.start_time)
+        end = time_to_minutes(shift.end_time)
+        end = end if end > start else MINUTES_PER_DAY
+        hours = max(end - start - shift.break_minutes, 0) / 60.0
+        rows.append((day, start, end, hours, hours * shift.hourly_rate))
+    
+    return np.array(rows, dtype=EXISTING_SHIFT_DTYPE)
+
+
+def occupancy_index(existing: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sorted interval index over existing shifts.
+    
+    Intervals are keyed by absolute minute (day * 1440 + minute) and sorted
+    by start; the second array holds the running maximum of the end keys, so
+    the latest reach of every interval starting before a point is one lookup.
+    """
+    start_keys = existing['day'].astype(np.int64) * MINUTES_PER_DAY + existing['start']
+    end_keys = existing['day'].astype(np.int64) * MINUTES_PER_DAY + existing['end']
+    order = np.argsort(start_keys, kind='stable')
+    return start_keys[order], np.maximum.accumulate(end_keys[order])
+
+
+def occupied_mask(candidates: np.ndarray, existing: np.ndarray) -> np.ndarray:
+    """Candidates that overlap an existing shift, by binary search in the occupancy index."""
+    if len(existing) == 0 or len(candidates) == 0:
+        return np.zeros(len(candidates), dtype=bool)
+    
+    start_keys, reach = occupancy_index(existing)
+    starts = candidates['day'].astype(np.int64) * MINUTES_PER_DAY + candidates['start']
+    ends = starts + candidates['duration']
+    
+    # A candidate overlaps iff some interval starting before its end reaches past its start
+    preceding = np.searchsorted(start_keys, ends, side='left')
+    return (preceding > 0) & (reach[np.maximum(preceding - 1, 0)] > starts)
+
+
+def prune_occupied(candidates: np.ndarray, date_range: pd.DatetimeIndex, existing_shifts: List[Any]) -> np.ndarray:
+    """Keep only candidates that do not overlap an existing shift."""
+    existing = existing_shift_table(existing_shifts, date_range)
+    return candidates[~occupied_mask(candidates, existing)]
+
+
+def slot_minutes(slot: Any) -> tuple:
+    """Start and end minute of an availability slot; an end at or before the start runs to midnight."""
+    start = time_to_minutes(slot.start_time)
+    end = time_to_minutes(slot.end_time)
+    return start, end if end > start else MINUTES_PER_DAY
+
+
+def time_to_minutes(time_str: str) -> int:
+    """Convert an HH:MM string to minutes since midnight."""
+    hours, minutes = map(int, time_str.split(':'))
+    return hours * 60 + minutes
+
+
+def candidate_hours(candidates: np.ndarray) -> np.ndarray:
+    """Scheduled hours of each candidate."""
+    return candidates['duration'] / 60.0
+
+
+def candidate_income(candidates: np.ndarray, hourly_rates: np.ndarray) -> np.ndarray:
+    """Scheduled income of each candidate (hourly rate times scheduled hours)."""
+    return hourly_rates[candidates['job']] * candidate_hours(candidates)
+
+
+def job_hourly_rates(job_sources: Dict[str, Any]) -> np.ndarray:
+    """Hourly rates indexed by job position in the job_sources mapping."""
+    return np.array([js.hourly_rate for js in job_sources.values()], dtype=float)
+
+
+def week_index(date_range: pd.DatetimeIndex) -> np.ndarray:
+    """ISO week block of each day, counted from the first week of the range."""
+    # ISO weeks start on Monday, so the week index follows from the day offset
+    return (np.arange(len(date_range)) + date_range[0].dayofweek) // 7
+
+
+def weekday_index(date_range: pd.DatetimeIndex) -> np.ndarray:
+    """Weekday of each day in the availability convention (0=Sunday, 6=Saturday)."""
+    return (date_range.dayofweek.to_numpy() + 1) % 7
+
+
+def constraint_limits(
+    constraints_dict: Dict[str, Any],
+    date_range: pd.DatetimeIndex
+) -> Dict[str, Optional[float]]:
+    """
+    Hour caps and income budget for the horizon (None when unconstrained).
+    
+    The fuyou limit is annual, so it is prorated to the number of days in the
+    optimization period.
+    """
+    limits = {'daily_hours': None, 'weekly_hours': None, 'income': None}
+    
+    if ConstraintType.DAILY_HOURS in constraints_dict:
+        limits['daily_hours'] = constraints_dict[ConstraintType.DAILY_HOURS].constraint_value
+    
+    if ConstraintType.WEEKLY_HOURS in constraints_dict:
+        limits['weekly_hours'] = constraints_dict[ConstraintType.WEEKLY_HOURS].constraint_value
+    
+    if ConstraintType.FUYOU_LIMIT in constraints_dict:
+        fuyou_limit = constraints_dict[ConstraintType.FUYOU_LIMIT].constraint_value
+        limits['income'] = fuyou_limit / (365 / len(date_range))
+    
+    return limits
+
+
+def residual_limits(
+    constraints_dict: Dict[str, Any],
+    date_range: pd.DatetimeIndex,
+    existing: np.ndarray
+) -> Dict[str, Any]:
+    """
+    Limits left for new shifts once the existing shifts are accounted for.
+    
+    Returns the daily caps per day, the weekly caps per ISO week (both in
+    hours) and the remaining income budget; None when unconstrained.
+    Existing shifts stay in the schedule whatever the optimizer picks, so
+    their hours and income come off the caps up front, clipped at zero.
+    """
+    limits = constraint_limits(constraints_dict, date_range)
+    weeks = week_index(date_range)
+    day_hours = np.bincount(existing['day'], weights=existing['hours'], minlength=len(date_range))
+    
+    if limits['daily_hours'] is not None:
+        limits['daily_hours'] = np.maximum(limits['daily_hours'] - day_hours, 0.0)
+    
+    if limits['weekly_hours'] is not None:
+        week_hours = np.bincount(weeks, weights=day_hours, minlength=int(weeks[-1]) + 1)
+        limits['weekly_hours'] = np.maximum(limits['weekly_hours'] - week_hours, 0.0)
+    
+    if limits['income'] is not None:
+        limits['income'] = max(limits['income'] - float(existing['income'].sum()), 0.0)
+    
+    return limits
+
+
+def problem_limits(problem_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Residual limits of a problem after its existing shifts (see residual_limits)."""
+    date_range = problem_data['date_range']
+    existing = existing_shift_table(problem_data.get('existing_shifts', []), date_range)
+    return residual_limits(problem_data['constraints'], date_range, existing)
+
+
+def day_pattern_menu(
+    starts: np.ndarray,
+    durations: np.ndarray,
+    values: np.ndarray,
+    minute_cap: int,
+    unit: int
+) -> List[np.ndarray]:
+    """
+    Highest-value set of non-overlapping shifts on one day for every total duration.
+    
+    Weighted interval scheduling with a duration dimension: shifts are
+    processed by end time, and each DP row holds the best value for every
+    total duration (in multiples of unit minutes) using the shifts so far.
+    Returns one array of shift positions per reachable total duration
+    (0, 1, 2, ... units up to minute_cap), empty arrays included.
+    """
+    if len(starts) == 0:
+        return [np.zeros(0, dtype=np.intp)]
+    
+    ends = starts + durations
+    order = np.argsort(ends, kind='stable')
+    sorted_starts = starts[order]
+    sorted_ends = ends[order]
+    weights = (durations[order] // unit).astype(np.intp)
+    sorted_values = values[order]
+    capacity = int(minute_cap // unit)
+    
+    # Shifts ending at or before each start can precede it
+    predecessors = np.searchsorted(sorted_ends, sorted_starts, side='right')
+    
+    table = np.full((len(order) + 1, capacity + 1), -np.inf)
+    table[0, 0] = 0.0
+    taken = np.zeros((len(order) + 1, capacity + 1), dtype=bool)
+    
+    for i in range(1, len(order) + 1):
+        table[i] = table[i - 1]
+        weight = weights[i - 1]
+        if weight > capacity:
+            continue
+        
+        candidate = table[predecessors[i - 1], :capacity + 1 - weight] + sorted_values[i - 1]
+        better = candidate > table[i, weight:]
+        table[i, weight:][better] = candidate[better]
+        taken[i, weight:] = better
+    
+    # Walk the decisions back from every reachable final duration
+    menu = []
+    for total in np.flatnonzero(np.isfinite(table[-1])):
+        chosen = []
+        i, used = len(order), int(total)
+        while i > 0:
+            if taken[i, used]:
+                chosen.append(order[i - 1])
+                used -= weights[i - 1]
+                i = predecessors[i - 1]
+            else:
+                i -= 1
+        menu.append(np.array(chosen[::-1], dtype=np.intp))
+    
+    return menu
+
+
+def best_day_pattern(
+    starts: np.ndarray,
+    durations: np.ndarray,
+    values: np.ndarray,
+    minute_cap: int,
+    unit: int
+) -> np.ndarray:
+    """Highest-value set of non-overlapping shifts on one day within a minute cap."""
+    menu = day_pattern_menu(starts, durations, values, minute_cap, unit)
+    return max(menu, key=lambda pattern: values[pattern].sum())
+
+
+def minutes_to_time(minutes: int) -> str:
+    """Format minutes since midnight as HH:MM."""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def materialize_shifts(
+    candidates: np.ndarray,
+    date_range: pd.DatetimeIndex,
+    job_sources: Dict[str, Any],
+    confidence: float,
+    reasoning: str = "Optimized shift at {job_name} for {hours:g} hours",
+    priority: int = 1
+) -> List[Dict[str, Any]]:
+    """
+    Turn selected candidate rows into shift dicts.
+    
+    Strings and dates are only created here, for the handful of selected
+    shifts, never for the full candidate table.
+    """
+    job_ids = list(job_sources)
+    shifts = []
+    
+    for day, job, start, duration in candidates.tolist():
+        job_source = job_sources[job_ids[job]]
+        hours = duration / 60
+        
+        # Calculate working hours (assuming 30 min break for shifts > 6 hours)
+        break_minutes = 30 if hours > 6 else 0
+        working_hours = hours - (break_minutes / 60)
+        
+        shifts.append({
+            'job_source_id': job_ids[job],
+            'job_source_name': job_source.name,
+            'date': date_range[day].date(),
+            'start_time': minutes_to_time(start),
+            'end_time': minutes_to_time(start + duration),
+            'hourly_rate': job_source.hourly_rate,
+            'break_minutes': break_minutes,
+            'working_hours': working_hours,
+            'calculated_earnings': working_hours * job_source.hourly_rate,
+            'confidence': confidence,
+            'priority': priority,
+            'reasoning': reasoning.format(job_name=job_source.name, hours=hours),
+            'is_original': False
+        })
+    
+    return shifts
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Column generation over whole-day shift patterns for shift scheduling.
+"""
+
+import time
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from scipy.optimize import Bounds, LinearConstraint, linprog, milp
+from loguru import logger
+
+from models.optimization_models import (
+    ObjectiveType,
+    OptimizationPreferences
+)
+from algorithms.candidates import (
+    build_problem_candidates,
+    candidate_hours,
+    candidate_income,
+    day_pattern_menu,
+    job_hourly_rates,
+    materialize_shifts,
+    problem_limits,
+    week_index
+)
+
+
+class ColumnGenerationOptimizer:
+    """
+    Column generation optimizer over day patterns.
+    
+    A day pattern is a feasible set of non-overlapping shifts on one day
+    within the daily hour cap. The restricted master LP chooses at most one
+    pattern per day under the weekly and fuyou limits; new patterns are
+    priced per day from the master duals with a weighted-interval-scheduling
+    DP, so the master only ever holds patterns that improve the bound.
+    """
+    
+    def __init__(self):
+        self.name = "Column Generation Optimizer"
+        self.max_iterations = 100
+        self.reduced_cost_tolerance = 1e-6
+        logger.info(f"Initialized {self.name}")
+    
+    async def optimize(
+        self,
+        problem_data: Dict[str, Any],
+        objective: ObjectiveType,
+        constraints: List[Any],
+        preferences: OptimizationPreferences
+    ) -> Dict[str, Any]:
+        """
+        Optimize shift schedule using column generation.
+        
+        Runs price-and-branch: column generation solves the master LP
+        relaxation, then a MILP over the generated patterns picks an integral
+        schedule. timeout bounds the pricing loop and the final MILP.
+        """
+        logger.info(f"Starting column generation optimization with objective: {objective}")
+        start_time = time.time()
+        
+        date_range = problem_data['date_range']
+        job_sources = problem_data['job_sources']
+        limits = problem_limits(problem_data)
+        
+        # Patterns are integral in the final master, so presolve for an integral model
+        candidates, presolve_stats = build_problem_candidates(problem_data, integral=True)
+        if len(candidates) == 0:
+            return self._empty_solution('no_candidates')
+        
+        shift_costs = self._shift_costs(candidates, job_sources, objective)
+        shift_incomes = candidate_income(candidates, job_hourly_rates(job_sources))
+        shift_hours = candidate_hours(candidates)
+        
+        # Shifts of each day, as positions into the candidate table
+        day_bounds = np.searchsorted(candidates['day'], np.arange(len(date_range) + 1))
+        day_shifts = [np.arange(day_bounds[day], day_bounds[day + 1]) for day in range(len(date_range))]
+        
+        # Minutes left per day once existing shifts are counted
+        if limits['daily_hours'] is not None:
+            daily_caps = limits['daily_hours'] * 60
+        else:
+            daily_caps = np.full(len(date_range), 24 * 60)
+        unit = int(np.gcd.reduce(candidates['duration'].astype(int)))
+        weeks = week_index(date_range)
+        
+        # Seed the pool with each day's best pattern per total duration at zero duals
+        patterns: List[Tuple[int, np.ndarray]] = []
+        known = set()
+        for day, shifts in enumerate(day_shifts):
+            for pattern in self._price_day(shifts, candidates, -shift_costs, daily_caps[day], unit):
+                if len(pattern):
+                    patterns.append((day, pattern))
+                    known.add((day, pattern.tobytes()))
+        
+        if not patterns:
+            return self._empty_solution('no_improving_patterns')
+        
+        max_iterations = preferences.max_iterations or self.max_iterations
+        deadline = start_time + preferences.timeout if preferences.timeout else None
+        iterations = 0
+        master = None
+        
+        while iterations < max_iterations:
+            iterations += 1
+            costs, matrix, bounds = self._build_master(
+                patterns, shift_costs, shift_hours, shift_incomes, weeks, limits, len(date_range)
+            )
+            master = linprog(c=costs, A_ub=matrix, b_ub=bounds, bounds=(0, 1), method='highs')
+            if master.status != 0:
+                logger.warning(f"Column generation master failed: {master.message}")
+                return self._empty_solution('master_failed')
+            
+            # Row duals of the convexity, weekly and fuyou rows (all <= 0 in minimization form)
+            day_duals, week_duals, income_dual = self._split_duals(master.ineqlin.marginals, len(date_range), limits, weeks)
+            
+            # Price new patterns per day: value = -(cost - week dual * hours - fuyou dual * income)
+            new_patterns = []
+            for day, shifts in enumerate(day_shifts):
+                values = -(shift_costs - week_duals[weeks[day]] * shift_hours - income_dual * shift_incomes)
+                for pattern in self._price_day(shifts, candidates, values, daily_caps[day], unit):
+                    reduced_cost = -values[pattern].sum() - day_duals[day]
+                    key = (day, pattern.tobytes())
+                    if len(pattern) and reduced_cost < -self.reduced_cost_tolerance and key not in known:
+                        new_patterns.append((day, pattern))
+                        known.add(key)
+            
+            if not new_patterns or (deadline is not None and time.time() >= deadline):
+                break
+            patterns.extend(new_patterns)
+        
+        selected, solver_metadata = self._solve_integer_master(
+            patterns, shift_costs, shift_hours, shift_incomes, weeks, limits, len(date_range), deadline
+        )
+        
+        chosen = np.concatenate([patterns[p][1] for p in np.flatnonzero(selected)]) if selected.any() else np.zeros(0, dtype=np.intp)
+        solution_shifts = materialize_shifts(
+            candidates[np.sort(chosen)], date_range, job_sources, confidence=0.9,
+            reasoning="Day pattern shift at {job_name} for {hours:g} hours"
+        )
+        
+        # Costs are hours for MINIMIZE_HOURS and negated income for every other objective
+        objective_fun = float(shift_costs[chosen].sum())
+        objective_value = objective_fun if objective == ObjectiveType.MINIMIZE_HOURS else -objective_fun
+        lp_bound = master.fun if objective == ObjectiveType.MINIMIZE_HOURS else -master.fun
+        
+        logger.info(f"Column generation selected {len(solution_shifts)} shifts from {len(patterns)} patterns")
+        
+        return {
+            'shifts': solution_shifts,
+            'objective_value': objective_value,
+            'confidence_score': 0.9,
+            'metadata': {
+                'algorithm': 'column_generation',
+                'iterations': iterations,
+                'patterns_generated': len(patterns),
+                'num_candidates': len(candidates),
+                'presolve': presolve_stats,
+                'lp_bound': lp_bound,
+                'execution_time': time.time() - start_time,
+                **solver_metadata
+            }
+        }
+    
+    def _shift_costs(
+        self,
+        candidates: np.ndarray,
+        job_sources: Dict[str, Any],
+        objective: ObjectiveType
+    ) -> np.ndarray:
+        """Per-shift cost in minimization form, matching the linear programming objective."""
+        if objective == ObjectiveType.MINIMIZE_HOURS:
+            return candidate_hours(candidates)
+        return -candidate_income(candidates, job_hourly_rates(job_sources))
+    
+    def _price_day(
+        self,
+        shifts: np.ndarray,
+        candidates: np.ndarray,
+        values: np.ndarray,
+        daily_cap: float,
+        unit: int
+    ) -> List[np.ndarray]:
+        """
+        Best pattern for one day per total duration under the given shift values.
+        
+        Offering one pattern per duration instead of only the overall best
+        keeps the pool diverse when the duals rescale every shift alike (the
+        fuyou row prices income, which is also the objective).
+        """
+        shifts = shifts[values[shifts] > 0]
+        day_candidates = candidates[shifts]
+        menu = day_pattern_menu(
+            day_candidates['start'].astype(int),
+            day_candidates['duration'].astype(int),
+            values[shifts],
+            int(daily_cap),
+            unit
+        )
+        return [shifts[chosen] for chosen in menu]
+    
+    def _build_master(
+        self,
+        patterns: List[Tuple[int, np.ndarray]],
+        shift_costs: np.ndarray,
+        shift_hours: np.ndarray,
+        shift_incomes: np.ndarray,
+        weeks: np.ndarray,
+        limits: Dict[str, Optional[float]],
+        num_days: int
+    ) -> Tuple[np.ndarray, sparse.csr_matrix, np.ndarray]:
+        """
+        Restricted master over the pattern pool.
+        
+        Rows: one convexity row per day (at most one pattern), one row per
+        week for the weekly hour cap and a single fuyou income row.
+        """
+        pattern_days = np.array([day for day, _ in patterns])
+        costs = np.array([shift_costs[shifts].sum() for _, shifts in patterns])
+        hours = np.array([shift_hours[shifts].sum() for _, shifts in patterns])
+        incomes = np.array([shift_incomes[shifts].sum() for _, shifts in patterns])
+        columns = np.arange(len(patterns))
+        
+        rows = [pattern_days]
+        cols = [columns]
+        data = [np.ones(len(patterns))]
+        bounds = [np.ones(num_days)]
+        next_row = num_days
+        
+        if limits['weekly_hours'] is not None:
+            num_weeks = int(weeks.max()) + 1
+            rows.append(next_row + weeks[pattern_days])
+            cols.append(columns)
+            data.append(hours)
+            bounds.append(limits['weekly_hours'][:num_weeks])
+            next_row += num_weeks
+        
+        if limits['income'] is not None:
+            rows.append(np.full(len(patterns), next_row))
+            cols.append(columns)
+            data.append(incomes)
+            bounds.append([limits['income']])
+            next_row += 1
+        
+        matrix = sparse.csr_matrix(
+            (np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+            shape=(next_row, len(patterns))
+        )
+        return costs, matrix, np.concatenate(bounds)
+    
+    def _split_duals(
+        self,
+        marginals: np.ndarray,
+        num_days: int,
+        limits: Dict[str, Optional[float]],
+        weeks: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, float]:
+        """Split master row duals into day, week and fuyou parts (zero for absent rows)."""
+        day_duals = marginals[:num_days]
+        offset = num_days
+        
+        week_duals = np.zeros(int(weeks.max()) + 1)
+        if limits['weekly_hours'] is not None:
+            week_duals = marginals[offset:offset + len(week_duals)]
+            offset += len(week_duals)
+        
+        income_dual = float(marginals[offset]) if limits['income'] is not None else 0.0
+        return day_duals, week_duals, income_dual
+    
+    def _solve_integer_master(
+        self,
+        patterns: List[Tuple[int, np.ndarray]],
+        shift_costs: np.ndarray,
+        shift_hours: np.ndarray,
+        shift_incomes: np.ndarray,
+        weeks: np.ndarray,
+        limits: Dict[str, Optional[float]],
+        num_days: int,
+        deadline: Optional[float]
+    ) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """Pick at most one generated pattern per day with a MILP over the final pool."""
+        costs, matrix, bounds = self._build_master(
+            patterns, shift_costs, shift_hours, shift_incomes, weeks, limits, num_days
+        )
+        
+        options = {}
+        if deadline is not None:
+            options['time_limit'] = max(deadline - time.time(), 1.0)
+        
+        result = milp(
+            c=costs,
+            integrality=np.ones(len(costs)),
+            bounds=Bounds(0, 1),
+            constraints=[LinearConstraint(matrix, -np.inf, bounds)],
+            options=options
+        )
+        
+        metadata = {
+            'solve_mode': 'price_and_branch',
+            'solver_status': result.message,
+            'mip_gap': getattr(result, 'mip_gap', None)
+        }
+        
+        if result.x is None:
+            return np.zeros(len(patterns), dtype=bool), metadata
+        return result.x > 0.5, metadata
+    
+    def _empty_solution(self, reason: str) -> Dict[str, Any]:
+        """Return an empty result when no schedule could be produced."""
+        return {
+            'shifts': [],
+            'objective_value': 0,
+            'confidence_score': 0.1,
+            'metadata': {'algorithm': 'column_generation', 'reason': reason}
+        }
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Incremental fitness evaluation of mutation-only offspring.
+"""
+
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from models.optimization_models import ObjectiveType
+from algorithms.schedule_encoding import ScheduleEncoding
+
+# Evaluates a population from scratch: returns (penalized fitness, violation in hours)
+Evaluator = Callable[[np.ndarray], Tuple[np.ndarray, np.ndarray]]
+
+
+class DeltaEvaluator:
+    """
+    Generation-to-generation evaluation that scores copies by difference.
+    
+    Every individual of the current population may carry its evaluation
+    state (see ScheduleEncoding.evaluation_state). An offspring that is a
+    copy of one parent, unchanged (elites) or mutated, starts from that
+    parent's state and only the days its mutations touched are re-scored,
+    so its cost depends on the number of mutated genes, not the horizon.
+    Recombined offspring go to the wrapped full evaluator (e.g. a fitness
+    cache or the process pool); their states are only built if they later
+    parent a copy.
+    """
+    
+    def __init__(
+        self,
+        encoding: ScheduleEncoding,
+        objective: ObjectiveType,
+        penalty_weight: float,
+        evaluate: Evaluator
+    ):
+        self.encoding = encoding
+        self.objective = objective
+        self.penalty_weight = penalty_weight
+        self.full_evaluate = evaluate
+        self.population: Optional[np.ndarray] = None
+        self.states: Optional[Dict[str, np.ndarray]] = None
+        self.known: Optional[np.ndarray] = None
+        self.delta_evaluations = 0
+        self.full_evaluations = 0
+    
+    def evaluate(self, population: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Evaluate a population with no known parents, from scratch."""
+        self.population = population
+        self.states = None
+        self.known = np.zeros(len(population), dtype=bool)
+        self.full_evaluations += len(population)
+        return self.full_evaluate(population)
+    
+    def evaluate_offspring(
+        self,
+        population: np.ndarray,
+        sources: np.ndarray,
+        mutated: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Evaluate the next generation of the current population.
+        
+        sources[i] is the current individual that offspring i is a copy of,
+        or -1 when it was recombined; mutated holds the flat positions of
+        the genes mutated after copying.
+        """
+        fitness = np.empty(len(population))
+        violation = np.empty(len(population))
+        copies = np.flatnonzero(sources >= 0)
+        recombined = np.flatnonzero(sources < 0)
+        
+        if len(recombined):
+            fitness[recombined], violation[recombined] = self.full_evaluate(population[recombined])
+            self.full_evaluations += len(recombined)
+        
+        states = None
+        if len(copies):
+            parents = sources[copies]
+            self._ensure_states(np.unique(parents))
+            states = {key: np.zeros((len(population),) + value.shape[1:]) for key, value in self.states.items()}
+            for key, value in self.states.items():
+                states[key][copies] = value[parents]
+            
+            # Re-score only the (copy, day) pairs that mutations touched
+            num_days = population.shape[1]
+            owners, days, _ = np.unravel_index(mutated, population.shape)
+            of_copies = sources[owners] >= 0
+            owners, days = np.divmod(np.unique(owners[of_copies] * num_days + days[of_copies]), num_days)
+            self.encoding.apply_day_changes(
+                states, owners, days, self.population[sources[owners], days], population[owners, days]
+            )
+            
+            # Fitness only reads the per-individual totals, so scoring every row is cheap
+            state_fitness, state_violation = self.encoding.state_fitness(states, self.objective, self.penalty_weight)
+            fitness[copies], violation[copies] = state_fitness[copies], state_violation[copies]
+            self.delta_evaluations += len(copies)
+        
+        self.population = population
+        self.states = states
+        self.known = np.zeros(len(population), dtype=bool)
+        self.known[copies] = True
+        return fitness, violation
+    
+    def stats(self) -> Dict[str, int]:
+        """How many individuals were scored by delta and from scratch."""
+        return {'delta_evaluations': self.delta_evaluations, 'full_evaluations': self.full_evaluations}
+    
+    def _ensure_states(self, rows: np.ndarray) -> None:
+        """Build the states of current individuals that do not carry one yet."""
+        missing = rows[~self.known[rows]]
+        if not len(missing):
+            return
+        
+        fresh = self.encoding.evaluation_state(self.population[missing], self.objective)
+        if self.states is None:
+            self.states = {key: np.zeros((len(self.population),) + value.shape[1:]) for key, value in fresh.items()}
+        for key, value in fresh.items():
+            self.states[key][missing] = value
+        self.known[missing] = True
@@ -4,30 +4,81 @@ Genetic algorithm optimization for shift scheduling.
 """
 
 import asyncio
-from typing import Dict, List, Any, Optional
-import uuid
-import random
+import contextlib
+import copy
+import os
+import time
+from concurrent.futures import Executor
+from typing import Dict, List, Any, Optional, Tuple
 import numpy as np
 from loguru import logger
 
 from models.optimization_models import (
     ObjectiveType,
-    ConstraintType,
-    OptimizationPreferences
+    OptimizationPreferences,
+    TierLevel
 )
+from utils.config import get_settings
+from algorithms.candidates import materialize_shifts
+from algorithms.linear_programming import LinearProgrammingOptimizer
+from algorithms.schedule_encoding import ScheduleEncoding
+from algorithms.fitness_cache import FitnessCache, merge_stats
+from algorithms.delta_evaluation import DeltaEvaluator, Evaluator
+from algorithms.parallel_evaluation import ParallelEvaluator, SharedPopulation, attach_shared
 
 
 class GeneticAlgorithmOptimizer:
-    """Genetic algorithm optimizer for shift scheduling."""
+    """
+    Genetic algorithm optimizer for shift scheduling.
     
-    def __init__(self):
+    Individuals are integer genomes over the candidate shift table (see
+    ScheduleEncoding), and the population is one (population, days, slots)
+    array. Fitness, penalties, tournament selection, crossover and mutation
+    all run as batched array operations over the whole population.
+    """
+    
+    def __init__(
+        self,
+        executor: Optional[Executor] = None,
+        seed_optimizer: Optional[LinearProgrammingOptimizer] = None
+    ):
         self.name = "Genetic Algorithm Optimizer"
-        self.population_size = 50
-        self.generations = 100
-        self.mutation_rate = 0.1
+        self.executor = executor
+        self.settings = get_settings()
+        self.population_size = self.settings.genetic_algorithm_population
+        self.generations = self.settings.genetic_algorithm_generations
+        self.mutation_rate = 0.02  # per gene, at least one expected mutation per child
         self.crossover_rate = 0.8
+        self.elite_fraction = 0.2
+        self.tournament_size = 3
+        self.penalty_weight = 2.0  # violation cost relative to the objective value of an hour
+        self.parallel_workers = self.settings.process_pool_workers or os.cpu_count() or 1
+        self.parallel_min_genes = 200000  # population x days x slots below which IPC outweighs the work
+        self.islands = self.settings.genetic_algorithm_islands
+        self.migration_interval = self.settings.genetic_algorithm_migration_interval
+        self.migration_size = 2  # best individuals each island sends per migration
+        self.island_min_days = 90  # PRO horizons from this length run in island mode
+        self.stagnation_generations = 15  # stop after this many generations without improvement
+        self.convergence_threshold = 1e-4  # relative improvement that resets the stagnation count
+        self.fitness_cache_entries = self.settings.fitness_cache_entries
+        self.lp_seed_fraction = 0.1  # initial individuals copied from the LP schedule, perturbed
+        self.lp_seed_perturbation = 0.05  # per-gene probability of a random change in those copies
+        self.lp_seed_time_fraction = 0.25  # share of the remaining timeout the LP seed may use
+        self.lp_seed_min_budget = 4.0  # seconds; shorter remaining timeouts go to evolution alone
+        self.greedy_seed_fraction = 0.2  # initial individuals built by the rate-ordered greedy
+        self.greedy_seed_noise = 0.1  # log-normal sigma on the rates the greedy orders by
+        # The service passes its own LP optimizer, so all engines share one model structure cache
+        self.seed_optimizer = seed_optimizer or LinearProgrammingOptimizer(executor=executor)
         logger.info(f"Initialized {self.name}")
     
+    def __getstate__(self) -> Dict[str, Any]:
+        # Island workers receive the optimizer for its operators and rates only
+        state = self.__dict__.copy()
+        state['executor'] = None
+        state['settings'] = None
+        state['seed_optimizer'] = None
+        return state
+    
     async def optimize(
         self,
         problem_data: Dict[str, Any],
@@ -38,328 +89,527 @@ class GeneticAlgorithmOptimizer:
         """
         Optimize shift schedule using genetic algorithm.
         
-        This is a placeholder implementation for the genetic algorithm.
-        In a production system, you would implement:
-        - Population initialization
-        - Fitness evaluation
-        - Selection, crossover, and mutation operators
-        - Convergence criteria
+        Every individual is repaired to feasibility before it is evaluated
+        (see ScheduleEncoding.repair), and days are inherited whole in
+        crossover; violations are still penalized at penalty_weight times
+        the objective value of an hour as a safeguard. The best feasible
+        individual seen in any generation is returned.
+        
+        With enable_parallel and a large enough population, fitness is
+        evaluated in shards on the shared process pool (see
+        ParallelEvaluator). Long PRO-tier horizons instead run one island
+        per worker process (see _evolve_islands). The search runs in a
+        thread so the event loop stays free.
         """
         logger.info(f"Starting genetic algorithm optimization with objective: {objective}")
         
-        # Enhanced genetic algorithm implementation
         try:
-            # Initialize population
-            population = self._initialize_population(problem_data, constraints)
-            
-            best_solution = None
-            best_fitness = float('-inf')
-            
-            # Evolution loop
-            for generation in range(self.generations):
-                # Evaluate fitness for all individuals
-                fitness_scores = []
-                for individual in population:
-                    fitness = self._evaluate_fitness(individual, objective, constraints)
-                    fitness_scores.append(fitness)
-                    
-                    # Track best solution
-                    if fitness > best_fitness:
-                        best_fitness = fitness
-                        best_solution = individual.copy()
-                
-                # Selection and reproduction
-                population = self._next_generation(population, fitness_scores)
-                
-                # Progress logging
-                if generation % 20 == 0:
-                    logger.info(f"Generation {generation}: Best fitness = {best_fitness:.4f}")
+            start_time = time.time()
+            encoding, presolve_stats = ScheduleEncoding.from_problem(problem_data)
+            if len(encoding.candidates) == 0:
+                return self._empty_solution('no_candidates')
             
-            # Optimize the solution based on objective
-            if best_solution:
-                optimized_shifts = self._optimize_for_objective(best_solution, objective, preferences)
-                return self._format_solution(optimized_shifts, best_fitness)
+            # The seed solve counts against the timeout like the evolution does
+            seed_start = time.time()
+            seed_genome = await self._lp_seed(encoding, problem_data, objective, preferences, start_time)
+            seed_time = time.time() - seed_start
+            best_genome, search_metadata = await asyncio.to_thread(
+                self._search, encoding, problem_data, objective, preferences, start_time, seed_genome
+            )
             
+            result = self._format_solution(
+                encoding, best_genome, problem_data, objective, presolve_stats, time.time() - start_time
+            )
+            result['metadata'].update(search_metadata)
+            result['metadata']['lp_seeded'] = seed_genome is not None
+            result['metadata']['lp_seed_time'] = seed_time
+            return result
+        
         except Exception as e:
             logger.error(f"Genetic algorithm optimization failed: {e}")
-            
-        # Fallback to simple solution
-        # TODO: Implement full genetic algorithm
         
-        return await self._create_fallback_solution(problem_data, objective)
+        return await self._create_fallback_solution(problem_data, objective, constraints, preferences)
     
-    def _initialize_population(self, problem_data: Dict[str, Any], constraints: List[Any]) -> List[Dict[str, Any]]:
-        """Initialize population with random viable solutions."""
-        population = []
-        
-        # Extract problem parameters
-        num_days = problem_data.get('time_horizon_days', 30)
-        min_hours = problem_data.get('min_weekly_hours', 10)
-        max_hours = problem_data.get('max_weekly_hours', 40)
-        hourly_rates = problem_data.get('hourly_rates', [1000, 1200, 1500])
-        
-        for _ in range(self.population_size):
-            individual = self._generate_random_schedule(num_days, min_hours, max_hours, hourly_rates)
-            population.append(individual)
+    def _search(
+        self,
+        encoding: ScheduleEncoding,
+        problem_data: Dict[str, Any],
+        objective: ObjectiveType,
+        preferences: OptimizationPreferences,
+        start_time: float,
+        seed_genome: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """
+        Run the evolution; returns the best feasible genome and search metadata.
         
-        return population
-    
-    def _generate_random_schedule(self, num_days: int, min_hours: int, max_hours: int, hourly_rates: List[int]) -> Dict[str, Any]:
-        """Generate a random but viable shift schedule."""
-        schedule = {
-            'shifts': [],
-            'total_hours': 0,
-            'total_earnings': 0
+        max_iterations caps the generations, timeout is a wall-clock deadline
+        checked between generations, and the run also stops once the
+        population's best fitness has not improved by more than
+        convergence_threshold (relative) for stagnation_generations
+        generations.
+        """
+        rng = np.random.default_rng(preferences.random_seed)
+        stopping = {
+            'generations': preferences.max_iterations or self.generations,
+            'deadline': start_time + preferences.timeout if preferences.timeout else None,
+            'patience': self.stagnation_generations,
+            'threshold': preferences.convergence_threshold or self.convergence_threshold
+        }
+        if self._use_islands(problem_data, preferences):
+            return self._evolve_islands(encoding, objective, rng, stopping, seed_genome)
+        
+        population = self._initial_population(encoding, rng, self.population_size, seed_genome)
+        parallel = self._use_process_pool(population, preferences)
+        evaluator = ParallelEvaluator(
+            encoding, self.population_size, self.executor, self.parallel_workers, objective, self.penalty_weight
+        ) if parallel else None
+        
+        cache = FitnessCache(self.fitness_cache_entries)
+        with evaluator or contextlib.nullcontext():
+            evaluate = evaluator.evaluate if evaluator is not None else self._in_process_evaluator(encoding, objective)
+            delta = DeltaEvaluator(encoding, objective, self.penalty_weight, cache.bind(evaluate))
+            run = self._evolve(encoding, population, rng, delta, **stopping)
+        
+        return run['best_genome'], {
+            'parallel_workers': self.parallel_workers if parallel else 1,
+            'stop_reason': run['stop_reason'],
+            'generations_used': len(run['history']) - 1,
+            'best_fitness_history': run['history'],
+            'fitness_cache': cache.stats(),
+            'delta_evaluation': delta.stats()
         }
-        
-        weekly_hours = random.uniform(min_hours, max_hours)
-        hours_per_day = weekly_hours / 7
-        
-        for day in range(num_days):
-            if random.random() < 0.6:  # 60% chance of working on any day
-                daily_hours = max(2, min(8, random.normalvariate(hours_per_day, 2)))
-                hourly_rate = random.choice(hourly_rates)
-                
-                shift = {
-                    'date': f'day_{day}',
-                    'hours': daily_hours,
-                    'hourly_rate': hourly_rate,
-                    'earnings': daily_hours * hourly_rate
-                }
-                schedule['shifts'].append(shift)
-                schedule['total_hours'] += daily_hours
-                schedule['total_earnings'] += shift['earnings']
-        
-        return schedule
-    
-    def _evaluate_fitness(self, individual: Dict[str, Any], objective: ObjectiveType, constraints: List[Any]) -> float:
-        """Evaluate fitness score for an individual solution."""
-        fitness = 0.0
-        
-        # Base fitness on objective
-        if objective == ObjectiveType.MAXIMIZE_EARNINGS:
-            fitness += individual['total_earnings'] / 1000000  # Normalize to [0,1]
-        elif objective == ObjectiveType.MINIMIZE_TAX_BURDEN:
-            # Higher earnings = higher tax burden (inverse)
-            fitness += max(0, 2000000 - individual['total_earnings']) / 2000000
-        elif objective == ObjectiveType.BALANCE_WORKLOAD:
-            # Prefer moderate working hours
-            ideal_hours = 25 * 4  # 25 hours/week * 4 weeks
-            hours_diff = abs(individual['total_hours'] - ideal_hours)
-            fitness += max(0, 1 - hours_diff / ideal_hours)
-        
-        # Apply constraint penalties
-        penalty = self._calculate_constraint_penalties(individual, constraints)
-        fitness = max(0, fitness - penalty)
-        
-        return fitness
     
-    def _calculate_constraint_penalties(self, individual: Dict[str, Any], constraints: List[Any]) -> float:
-        """Calculate penalty for constraint violations."""
-        penalty = 0.0
-        
-        # Japanese part-time work constraints
-        annual_limit = 1030000  # Basic tax-free limit
-        if individual['total_earnings'] > annual_limit:
-            penalty += (individual['total_earnings'] - annual_limit) / 100000 * 0.5
-        
-        # Weekly hours constraint
-        weekly_hours = individual['total_hours'] / 4
-        if weekly_hours > 40:
-            penalty += (weekly_hours - 40) * 0.1
-        
-        return penalty
+    def _in_process_evaluator(self, encoding: ScheduleEncoding, objective: ObjectiveType) -> Evaluator:
+        return lambda population: encoding.fitness(population, objective, self.penalty_weight)
     
-    def _next_generation(self, population: List[Dict[str, Any]], fitness_scores: List[float]) -> List[Dict[str, Any]]:
-        """Generate next generation through selection and reproduction."""
-        new_population = []
-        
-        # Sort population by fitness
-        sorted_indices = sorted(range(len(fitness_scores)), key=lambda i: fitness_scores[i], reverse=True)
-        
-        # Elitism: keep top 20% of population
-        elite_size = int(self.population_size * 0.2)
-        for i in range(elite_size):
-            new_population.append(population[sorted_indices[i]].copy())
+    def _evolve(
+        self,
+        encoding: ScheduleEncoding,
+        population: np.ndarray,
+        rng: np.random.Generator,
+        evaluator: DeltaEvaluator,
+        generations: int,
+        deadline: Optional[float] = None,
+        patience: Optional[int] = None,
+        threshold: float = 0.0
+    ) -> Dict[str, Any]:
+        """
+        Evolve a population for up to a number of generations.
         
-        # Generate rest through crossover and mutation
-        while len(new_population) < self.population_size:
-            parent1 = self._tournament_selection(population, fitness_scores)
-            parent2 = self._tournament_selection(population, fitness_scores)
+        Returns the final population and its fitness, the best feasible
+        genome seen and its fitness, the population's best (penalized)
+        fitness after every generation (index 0 = initial population) and
+        why the run stopped. The empty schedule is always feasible (and
+        scores 0), so there is always a best genome.
+        """
+        best_genome = np.zeros(encoding.shape, dtype=np.int16)
+        best_fitness = 0.0
+        history = []
+        stagnant = 0
+        stop_reason = 'max_generations'
+        
+        fitness, violation = evaluator.evaluate(population)
+        for generation in range(generations + 1):
+            if generation:
+                population, sources, mutated = self._next_generation(encoding, population, fitness, rng)
+                fitness, violation = evaluator.evaluate_offspring(population, sources, mutated)
+            
+            # Track the best feasible individual
+            feasible_fitness = np.where(violation <= 1e-9, fitness, -np.inf)
+            leader = int(np.argmax(feasible_fitness))
+            if feasible_fitness[leader] > best_fitness:
+                best_fitness = float(feasible_fitness[leader])
+                best_genome = population[leader].copy()
             
-            if random.random() < self.crossover_rate:
-                child = self._crossover(parent1, parent2)
-            else:
-                child = parent1.copy()
+            # Elitism keeps the population's best fitness non-decreasing
+            history.append(float(fitness.max()))
+            if generation:
+                improved = history[-1] - history[-2] > threshold * max(abs(history[-2]), 1.0)
+                stagnant = 0 if improved else stagnant + 1
             
-            if random.random() < self.mutation_rate:
-                child = self._mutate(child)
+            # Progress logging
+            if generation % 20 == 0:
+                logger.info(f"Generation {generation}: Best fitness = {best_fitness:.4f}")
             
-            new_population.append(child)
+            if generation == generations:
+                break
+            if patience is not None and stagnant >= patience:
+                stop_reason = 'converged'
+                break
+            if deadline is not None and time.time() >= deadline:
+                stop_reason = 'timeout'
+                break
         
-        return new_population
-    
-    def _tournament_selection(self, population: List[Dict[str, Any]], fitness_scores: List[float]) -> Dict[str, Any]:
-        """Select individual using tournament selection."""
-        tournament_size = 3
-        tournament_indices = random.sample(range(len(population)), tournament_size)
-        best_idx = max(tournament_indices, key=lambda i: fitness_scores[i])
-        return population[best_idx].copy()
+        return {
+            'population': population,
+            'fitness': fitness,
+            'best_genome': best_genome,
+            'best_fitness': best_fitness,
+            'history': history,
+            'stop_reason': stop_reason
+        }
     
-    def _crossover(self, parent1: Dict[str, Any], parent2: Dict[str, Any]) -> Dict[str, Any]:
-        """Create child through crossover of two parents."""
-        child = {
-            'shifts': [],
-            'total_hours': 0,
-            'total_earnings': 0
+    def _evolve_islands(
+        self,
+        encoding: ScheduleEncoding,
+        objective: ObjectiveType,
+        rng: np.random.Generator,
+        stopping: Dict[str, Any],
+        seed_genome: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """
+        Island model: one sub-population per worker process, with migration.
+        
+        Every island evolves for migration_interval generations with its own
+        mutation and crossover rates, then its best migration_size
+        individuals replace the worst of the next island in a ring. All
+        islands live in one shared population block, so an epoch only ships
+        shard bounds out and each island's fitness and best genome back.
+        Stagnation is judged on the best over all islands, per epoch. Each
+        island call keeps its own fitness cache, so cache statistics are
+        summed over islands and epochs.
+        """
+        size = self.population_size
+        island_optimizers = []
+        for mutation_rate, crossover_rate in self._island_rates():
+            island = copy.copy(self)
+            island.mutation_rate, island.crossover_rate = mutation_rate, crossover_rate
+            island_optimizers.append(island)
+        
+        best_genome = np.zeros(encoding.shape, dtype=np.int16)
+        best_fitness = 0.0
+        history = [-np.inf]
+        stagnant = 0
+        stop_reason = 'max_generations'
+        epochs = 0
+        cache_stats = []
+        delta_stats = {'delta_evaluations': 0, 'full_evaluations': 0}
+        
+        shared = SharedPopulation(encoding, self.islands * size)
+        try:
+            shared.population[:] = self._initial_population(encoding, rng, self.islands * size, seed_genome)
+            while len(history) - 1 < stopping['generations']:
+                generations = min(self.migration_interval, stopping['generations'] - (len(history) - 1))
+                futures = [
+                    self.executor.submit(
+                        _evolve_island, island, shared.handle, index * size, (index + 1) * size,
+                        generations, objective, int(rng.integers(2 ** 63)), stopping['deadline']
+                    )
+                    for index, island in enumerate(island_optimizers)
+                ]
+                runs = [future.result() for future in futures]
+                epochs += 1
+                cache_stats.extend(run.pop('fitness_cache') for run in runs)
+                for run in runs:
+                    for field, count in run.pop('delta_evaluation').items():
+                        delta_stats[field] += count
+                
+                previous = history[-1]
+                for run in runs:
+                    if run['best_fitness'] > best_fitness:
+                        best_genome, best_fitness = run['best_genome'], run['best_fitness']
+                
+                # Islands may stop early on the deadline, so histories can differ in length
+                epoch_history = np.full((len(runs), max(len(run['history']) for run in runs)), -np.inf)
+                for index, run in enumerate(runs):
+                    epoch_history[index, :len(run['history'])] = run['history']
+                if epochs == 1:
+                    history[0] = float(epoch_history[:, 0].max())
+                history.extend(np.maximum.accumulate(np.maximum(epoch_history.max(axis=0)[1:], history[-1])).tolist())
+                
+                self._migrate(shared.population, [run['fitness'] for run in runs])
+                
+                improved = history[-1] - previous > stopping['threshold'] * max(abs(previous), 1.0)
+                stagnant = 0 if improved else stagnant + generations
+                if stopping['deadline'] is not None and time.time() >= stopping['deadline']:
+                    stop_reason = 'timeout'
+                    break
+                if stagnant >= stopping['patience']:
+                    stop_reason = 'converged'
+                    break
+        finally:
+            shared.close()
+        
+        return best_genome, {
+            'parallel_workers': self.parallel_workers,
+            'stop_reason': stop_reason,
+            'generations_used': len(history) - 1,
+            'best_fitness_history': history,
+            'fitness_cache': merge_stats(cache_stats),
+            'delta_evaluation': delta_stats,
+            'islands': {
+                'count': self.islands,
+                'epochs': epochs,
+                'migration_interval': self.migration_interval,
+                'migration_size': self.migration_size,
+                'mutation_rates': [island.mutation_rate for island in island_optimizers],
+                'crossover_rates': [island.crossover_rate for island in island_optimizers]
+            }
         }
-        
-        # Simple crossover: randomly choose shifts from either parent
-        all_shifts = parent1['shifts'] + parent2['shifts']
-        selected_shifts = random.sample(all_shifts, min(len(all_shifts), random.randint(5, 15)))
-        
-        for shift in selected_shifts:
-            child['shifts'].append(shift.copy())
-            child['total_hours'] += shift['hours']
-            child['total_earnings'] += shift['earnings']
-        
-        return child
     
-    def _mutate(self, individual: Dict[str, Any]) -> Dict[str, Any]:
-        """Apply mutation to an individual."""
-        mutated = individual.copy()
+    def _island_rates(self) -> List[Tuple[float, float]]:
+        """Per-island (mutation, crossover) rates, from exploitative to explorative."""
+        mutation_rates = self.mutation_rate * 2.0 ** np.linspace(-1, 2, self.islands)
+        crossover_rates = np.linspace(0.95, 0.6, self.islands)
+        return list(zip(mutation_rates.tolist(), crossover_rates.tolist()))
+    
+    def _migrate(self, population: np.ndarray, island_fitness: List[np.ndarray]) -> None:
+        """Ring migration in place: each island's best replace the next island's worst."""
+        size = self.population_size
+        ranked = [np.argsort(-fitness, kind='stable') for fitness in island_fitness]
+        migrants = [
+            population[index * size + order[:self.migration_size]].copy()
+            for index, order in enumerate(ranked)
+        ]
+        for index in range(len(ranked)):
+            target = (index + 1) % len(ranked)
+            worst = ranked[target][-self.migration_size:]
+            population[target * size + worst] = migrants[index]
+    
+    def _use_islands(self, problem_data: Dict[str, Any], preferences: OptimizationPreferences) -> bool:
+        """Island mode is for long PRO-tier horizons on the shared process pool."""
+        return (
+            self.executor is not None
+            and preferences.enable_parallel
+            and self.parallel_workers > 1
+            and self.islands > 1
+            and problem_data.get('tier_level') == TierLevel.PRO
+            and len(problem_data['date_range']) >= self.island_min_days
+        )
+    
+    def _use_process_pool(self, population: np.ndarray, preferences: OptimizationPreferences) -> bool:
+        """Shard evaluation only when enabled and the population is big enough to pay for the IPC."""
+        return (
+            self.executor is not None
+            and preferences.enable_parallel
+            and self.parallel_workers > 1
+            and population.size >= self.parallel_min_genes
+        )
+    
+    def _initial_population(
+        self,
+        encoding: ScheduleEncoding,
+        rng: np.random.Generator,
+        size: int,
+        seed_genome: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Hybrid initial population, repaired to feasibility and shuffled.
+        
+        lp_seed_fraction of the individuals are the LP schedule (one exact
+        copy, the rest with each gene redrawn or emptied with probability
+        lp_seed_perturbation), greedy_seed_fraction come from the
+        rate-ordered greedy (see ScheduleEncoding.greedy_population) and the
+        rest are random, which keeps the population diverse. Shuffling
+        spreads the seeds over the islands.
+        """
+        population = encoding.random_population(rng, size)
+        greedy = int(size * self.greedy_seed_fraction)
+        population[:greedy] = encoding.greedy_population(rng, greedy, self.greedy_seed_noise)
+        
+        if seed_genome is not None:
+            copies = population[greedy:greedy + max(int(size * self.lp_seed_fraction), 1)]
+            copies[:] = seed_genome
+            perturbed = rng.random(copies[1:].shape) < self.lp_seed_perturbation
+            redrawn = np.where(rng.random(copies[1:].shape) < 0.5, encoding.random_genes(rng, copies[1:].shape), 0)
+            copies[1:][perturbed] = redrawn[perturbed]
+        
+        encoding.repair(population)
+        return population[rng.permutation(size)]
+    
+    async def _lp_seed(
+        self,
+        encoding: ScheduleEncoding,
+        problem_data: Dict[str, Any],
+        objective: ObjectiveType,
+        preferences: OptimizationPreferences,
+        start_time: float
+    ) -> Optional[np.ndarray]:
+        """
+        Genome of a fast LP relaxation solve, rounded at 0.5, for seeding.
+        
+        The LP can only express income or hours, so other objectives are
+        seeded from the income-maximizing schedule and left to evolution to
+        improve. Under a timeout the solve is limited to
+        lp_seed_time_fraction of the time left, and skipped when less than
+        lp_seed_min_budget seconds are left. Returns None when the LP is
+        skipped or fails.
+        """
+        time_limit = None
+        if preferences.timeout:
+            remaining = start_time + preferences.timeout - time.time()
+            if remaining < self.lp_seed_min_budget:
+                logger.info("Too little time left for a linear programming seed; skipping it")
+                return None
+            time_limit = int(remaining * self.lp_seed_time_fraction)
+        
+        lp_objective = ObjectiveType.MAXIMIZE_INCOME
+        if objective == ObjectiveType.MINIMIZE_HOURS:
+            lp_objective = ObjectiveType.MINIMIZE_HOURS
+        result = await self.seed_optimizer.optimize(
+            {**problem_data, 'objective': lp_objective},
+            lp_objective,
+            [],
+            OptimizationPreferences(incremental=False, timeout=time_limit)
+        )
+        model_state = result.get('model_state')
+        if model_state is None:
+            logger.warning("Linear programming seed unavailable; initial population is greedy and random only")
+            return None
+        return encoding.encode(model_state['candidates'][model_state['selected']])
+    
+    def _next_generation(
+        self,
+        encoding: ScheduleEncoding,
+        population: np.ndarray,
+        fitness: np.ndarray,
+        rng: np.random.Generator
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Elitism plus tournament-selected, recombined and mutated children.
         
-        if mutated['shifts'] and random.random() < 0.5:
-            # Mutate a random shift
-            shift_idx = random.randint(0, len(mutated['shifts']) - 1)
-            shift = mutated['shifts'][shift_idx]
-            
-            # Randomly modify hours or rate
-            if random.random() < 0.5:
-                shift['hours'] = max(2, min(8, shift['hours'] + random.normalvariate(0, 1)))
-            else:
-                shift['hourly_rate'] = random.choice([1000, 1200, 1500])
-            
-            shift['earnings'] = shift['hours'] * shift['hourly_rate']
-            
-            # Recalculate totals
-            mutated['total_hours'] = sum(s['hours'] for s in mutated['shifts'])
-            mutated['total_earnings'] = sum(s['earnings'] for s in mutated['shifts'])
+        Also returns the lineage delta evaluation needs: the individual each
+        member of the new population is a copy of (-1 when recombined) and
+        the flat positions of the genes mutated or emptied by repair.
+        """
+        elite_size = int(len(population) * self.elite_fraction)
+        elite = np.argsort(-fitness, kind='stable')[:elite_size]
+        num_children = len(population) - elite_size
+        
+        parents = self._tournament_selection(fitness, 2 * num_children, rng).reshape(2, num_children)
+        children, recombined = self._crossover(population[parents[0]], population[parents[1]], rng)
+        mutated = self._mutate(encoding, children, rng)
+        mutated = np.concatenate([mutated, encoding.repair(children, touched=mutated)])
+        
+        sources = np.concatenate([elite, np.where(recombined, -1, parents[0])])
+        mutated += elite_size * children[0].size
+        return np.concatenate([population[elite], children]), sources, mutated
+    
+    def _tournament_selection(self, fitness: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+        """Indices of count tournament winners."""
+        contenders = rng.integers(len(fitness), size=(count, self.tournament_size))
+        return contenders[np.arange(count), np.argmax(fitness[contenders], axis=1)]
+    
+    def _crossover(
+        self,
+        first: np.ndarray,
+        second: np.ndarray,
+        rng: np.random.Generator
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Uniform day-boundary crossover, applied to each pair with probability crossover_rate.
         
+        Each day is inherited whole from one parent, so days stay free of
+        overlaps and within their caps; only weekly and fuyou totals can
+        need repair. Returns the children and which pairs were recombined;
+        the others are copies of the first parent.
+        """
+        recombined = rng.random(len(first)) < self.crossover_rate
+        mask = rng.random(first.shape[:2], dtype=np.float32) < 0.5
+        mask &= recombined[:, np.newaxis]
+        mask = mask[:, :, np.newaxis]
+        return np.where(mask, second, first), recombined
+    
+    def _mutate(self, encoding: ScheduleEncoding, children: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """Reset random genes in place to a random option or to an empty slot; returns their flat positions."""
+        gene_rate = max(self.mutation_rate, 1 / children[0].size)
+        mutated = np.flatnonzero(rng.random(children.size, dtype=np.float32) < gene_rate)
+        _, days, _ = np.unravel_index(mutated, children.shape)
+        
+        counts = encoding.option_counts[days]
+        replacements = (1 + rng.random(len(mutated)) * counts).astype(np.int16) * (counts > 0)
+        children.reshape(-1)[mutated] = np.where(rng.random(len(mutated)) < 0.5, replacements, 0)
         return mutated
     
-    def _optimize_for_objective(self, solution: Dict[str, Any], objective: ObjectiveType, preferences: OptimizationPreferences) -> Dict[str, Any]:
-        """Fine-tune solution for specific objective."""
-        optimized = solution.copy()
+    def _format_solution(
+        self,
+        encoding: ScheduleEncoding,
+        genome: np.ndarray,
+        problem_data: Dict[str, Any],
+        objective: ObjectiveType,
+        presolve_stats: Dict[str, int],
+        execution_time: float
+    ) -> Dict[str, Any]:
+        """Format the best genome for the API response."""
+        selected = encoding.candidates[encoding.decode(genome)]
+        solution_shifts = materialize_shifts(
+            selected, problem_data['date_range'], problem_data['job_sources'], confidence=0.8,
+            reasoning="Genetic algorithm shift at {job_name} for {hours:g} hours"
+        )
         
-        if objective == ObjectiveType.MAXIMIZE_EARNINGS:
-            # Prioritize higher-paying shifts
-            optimized['shifts'] = sorted(optimized['shifts'], 
-                                       key=lambda s: s['hourly_rate'], reverse=True)
-        elif objective == ObjectiveType.MINIMIZE_TAX_BURDEN:
-            # Ensure staying under tax thresholds
-            annual_limit = 1030000
-            if optimized['total_earnings'] > annual_limit:
-                # Remove lowest value shifts until under limit
-                optimized['shifts'] = sorted(optimized['shifts'], 
-                                           key=lambda s: s['earnings'], reverse=True)
-                current_earnings = 0
-                valid_shifts = []
-                for shift in optimized['shifts']:
-                    if current_earnings + shift['earnings'] <= annual_limit:
-                        valid_shifts.append(shift)
-                        current_earnings += shift['earnings']
-                
-                optimized['shifts'] = valid_shifts
-                optimized['total_hours'] = sum(s['hours'] for s in valid_shifts)
-                optimized['total_earnings'] = sum(s['earnings'] for s in valid_shifts)
+        state = encoding.evaluation_state(genome[np.newaxis], objective)
+        score = float(encoding.state_scores(state, objective)[0])
+        objective_value = -score if objective == ObjectiveType.MINIMIZE_HOURS else score
+        
+        logger.info(f"Genetic algorithm selected {len(solution_shifts)} shifts with objective {objective_value}")
         
-        return optimized
+        return {
+            'shifts': solution_shifts,
+            'objective_value': objective_value,
+            'confidence_score': 0.8,
+            'metadata': {
+                'algorithm': 'genetic_algorithm',
+                'population_size': self.population_size,
+                'generations': self.generations,
+                'slots_per_day': encoding.slots,
+                'num_candidates': len(encoding.candidates),
+                'presolve': presolve_stats,
+                'execution_time': execution_time
+            }
+        }
     
-    def _format_solution(self, solution: Dict[str, Any], fitness: float) -> Dict[str, Any]:
-        """Format solution for API response."""
+    def _empty_solution(self, reason: str) -> Dict[str, Any]:
+        """Return an empty result when no schedule could be produced."""
         return {
-            'optimization_id': str(uuid.uuid4()),
-            'algorithm': 'genetic_algorithm',
-            'status': 'completed',
-            'fitness_score': fitness,
-            'total_earnings': solution['total_earnings'],
-            'total_hours': solution['total_hours'],
-            'num_shifts': len(solution['shifts']),
-            'shifts': solution['shifts'],
-            'recommendations': [
-                f"Optimized schedule with {len(solution['shifts'])} shifts",
-                f"Total earnings: ¥{solution['total_earnings']:,.0f}",
-                f"Average hourly rate: ¥{solution['total_earnings']/solution['total_hours']:.0f}" if solution['total_hours'] > 0 else "No shifts scheduled"
-            ],
-            'constraints_satisfied': True,
-            'execution_time': f"{self.generations} generations completed"
+            'shifts': [],
+            'objective_value': 0,
+            'confidence_score': 0.1,
+            'metadata': {'algorithm': 'genetic_algorithm', 'reason': reason}
         }
     
     async def _create_fallback_solution(
         self,
         problem_data: Dict[str, Any],
-        objective: ObjectiveType
+        objective: ObjectiveType,
+        constraints: List[Any],
+        preferences: OptimizationPreferences
     ) -> Dict[str, Any]:
-        """Create a fallback solution for genetic algorithm."""
-        logger.info("Creating fallback solution for genetic algorithm")
-        
-        # Use similar logic to linear programming fallback
-        date_range = problem_data['date_range']
-        job_sources = problem_data['job_sources']
-        
-        if not job_sources:
-            return {
-                'shifts': [],
-                'objective_value': 0,
-                'confidence_score': 0.1,
-                'metadata': {'algorithm': 'genetic_algorithm_fallback', 'reason': 'no_job_sources'}
-            }
-        
-        # Create a more diverse solution than linear programming
-        suggested_shifts = []
-        total_income = 0
+        """Fall back to the shared linear programming optimizer when the search fails."""
+        logger.info("Falling back to linear programming for genetic algorithm")
         
-        # Use multiple job sources for diversity
-        job_list = list(job_sources.values())
-        
-        for i, date in enumerate(date_range[:14]):  # Limit to 2 weeks
-            # Alternate between job sources
-            job_source = job_list[i % len(job_list)]
-            
-            # Vary shift hours
-            shift_hours = random.choice([4, 6, 8])
-            start_hour = random.randint(9, 16)  # 9 AM to 4 PM start
-            
-            calculated_earnings = shift_hours * job_source.hourly_rate
-            total_income += calculated_earnings
-            
-            shift = {
-                'job_source_id': job_source.id,
-                'job_source_name': job_source.name,
-                'date': date.date(),
-                'start_time': f"{start_hour:02d}:00",
-                'end_time': f"{start_hour + shift_hours:02d}:00",
-                'hourly_rate': job_source.hourly_rate,
-                'break_minutes': 30 if shift_hours > 6 else 0,
-                'working_hours': shift_hours - (0.5 if shift_hours > 6 else 0),
-                'calculated_earnings': calculated_earnings,
-                'confidence': 0.7,
-                'priority': 1,
-                'reasoning': f"Genetic algorithm solution: diverse shift pattern at {job_source.name}",
-                'is_original': False
-            }
-            
-            suggested_shifts.append(shift)
-        
-        return {
-            'shifts': suggested_shifts,
-            'objective_value': total_income,
-            'confidence_score': 0.7,
-            'metadata': {
-                'algorithm': 'genetic_algorithm_fallback',
-                'reason': 'full_implementation_pending',
-                'total_shifts': len(suggested_shifts),
-                'diversity_score': len(job_list) / max(len(job_list), 1)
-            }
-        }
\ No newline at end of file
+        result = await self.seed_optimizer.optimize(problem_data, objective, constraints, preferences)
+        result['metadata']['genetic_algorithm'] = {'reason': 'search_failed'}
+        return result
+
+
+def _evolve_island(
+    optimizer: GeneticAlgorithmOptimizer,
+    handle: Tuple[str, int, Tuple[int, ...]],
+    start: int,
+    stop: int,
+    generations: int,
+    objective: ObjectiveType,
+    seed: int,
+    deadline: Optional[float]
+) -> Dict[str, Any]:
+    """
+    Worker entry point: evolve population[start:stop] of a shared run in place.
+    
+    Returns the island's run summary (see _evolve) with fitness cache and
+    delta evaluation statistics, without the population, which stays in
+    the shared block.
+    """
+    _, encoding, population = attach_shared(*handle)
+    cache = FitnessCache(optimizer.fitness_cache_entries)
+    evaluator = DeltaEvaluator(
+        encoding, objective, optimizer.penalty_weight,
+        cache.bind(optimizer._in_process_evaluator(encoding, objective))
+    )
+    run = optimizer._evolve(
+        encoding, population[start:stop].copy(), np.random.default_rng(seed), evaluator, generations,
+        deadline=deadline
+    )
+    population[start:stop] = run.pop('population')
+    run['fitness_cache'] = cache.stats()
+    run['delta_evaluation'] = evaluator.stats()
+    return run
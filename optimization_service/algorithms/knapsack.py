@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Exact multiple-choice knapsack optimization for fuyou-limited income maximization.
+"""
+
+import time
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from models.optimization_models import (
+    ObjectiveType,
+    OptimizationPreferences
+)
+from algorithms.linear_programming import LinearProgrammingOptimizer
+from algorithms.candidates import (
+    build_problem_candidates,
+    candidate_income,
+    job_hourly_rates,
+    materialize_shifts,
+    problem_limits,
+    week_index
+)
+
+
+class KnapsackOptimizer:
+    """
+    Multiple-choice knapsack optimizer for MAXIMIZE_INCOME.
+    
+    Income is both the objective and the fuyou weight, so every achievable
+    (hours, income) combination matters, not just the best income per hour
+    total. Achievable incomes are kept as bitsets (Python ints, bit k = an
+    income of k buckets) at three levels:
+    
+    1. per day, a weighted-interval-scheduling DP over the day's shifts gives
+       every achievable (hours, income) option under the daily cap;
+    2. per ISO week, a DP over hours combines the day options under the
+       weekly cap;
+    3. over the horizon, a subset-sum over the weekly incomes finds the
+       largest total within the fuyou budget.
+    
+    The result is exact whenever the income bucket divides every shift
+    income (the usual case with integer hourly rates).
+    """
+    
+    def __init__(self, fallback_optimizer: Optional[LinearProgrammingOptimizer] = None):
+        self.name = "Multiple-Choice Knapsack Optimizer"
+        self.max_income_states = 200000  # coarsens the income bucket beyond this budget size
+        # The service passes its own LP optimizer, so all engines share one model structure cache
+        self.fallback_optimizer = fallback_optimizer or LinearProgrammingOptimizer()
+        logger.info(f"Initialized {self.name}")
+    
+    async def optimize(
+        self,
+        problem_data: Dict[str, Any],
+        objective: ObjectiveType,
+        constraints: List[Any],
+        preferences: OptimizationPreferences
+    ) -> Dict[str, Any]:
+        """Optimize shift schedule with the exact knapsack DP."""
+        logger.info(f"Starting knapsack optimization with objective: {objective}")
+        
+        if objective != ObjectiveType.MAXIMIZE_INCOME:
+            logger.warning("Knapsack optimization only supports maximize_income, falling back to linear programming")
+            result = await self.fallback_optimizer.optimize(problem_data, objective, constraints, preferences)
+            result['metadata']['knapsack'] = {'reason': 'unsupported_objective'}
+            return result
+        
+        start_time = time.time()
+        date_range = problem_data['date_range']
+        job_sources = problem_data['job_sources']
+        limits = problem_limits(problem_data)
+        
+        candidates, presolve_stats = build_problem_candidates(problem_data, integral=True)
+        if len(candidates) == 0:
+            return self._empty_solution('no_candidates')
+        
+        unit = int(np.gcd.reduce(candidates['duration'].astype(int)))
+        hour_weights = (candidates['duration'] // unit).astype(int)
+        # Hour-unit caps left per day and per week once existing shifts are counted
+        if limits['daily_hours'] is not None:
+            daily_caps = np.floor(limits['daily_hours'] * 60 / unit + 1e-9).astype(int)
+        else:
+            daily_caps = np.full(len(date_range), 24 * 60 // unit)
+        weeks = week_index(date_range)
+        if limits['weekly_hours'] is not None:
+            weekly_caps = np.floor(limits['weekly_hours'] * 60 / unit + 1e-9).astype(int)
+        else:
+            weekly_caps = np.bincount(weeks, weights=daily_caps).astype(int)
+        
+        rates = job_hourly_rates(job_sources)
+        incomes = candidate_income(candidates, rates)
+        income_bound = limits['income']
+        if income_bound is None:
+            income_bound = rates.max() * daily_caps.sum() * unit / 60
+        bucket, exact = self._income_resolution(incomes, income_bound)
+        income_weights = np.ceil(incomes / bucket - 1e-9).astype(int)
+        
+        # 1. Day tables, shared by days that offer exactly the same shifts under the same cap
+        day_bounds = np.searchsorted(candidates['day'], np.arange(len(date_range) + 1))
+        day_tables = {}
+        day_menus = []
+        for day in range(len(date_range)):
+            rows = np.arange(day_bounds[day], day_bounds[day + 1])
+            signature = (
+                int(daily_caps[day]),
+                np.stack([candidates[rows][field] for field in ('job', 'start', 'duration')]).tobytes()
+            )
+            if signature not in day_tables:
+                day_tables[signature] = self._day_table(
+                    candidates[rows], hour_weights[rows], income_weights[rows], int(daily_caps[day])
+                )
+            day_menus.append((rows, day_tables[signature]))
+        
+        if limits['income'] is not None:
+            budget = int(np.floor(limits['income'] / bucket + 1e-9))
+        else:
+            # Without a fuyou limit the budget is simply the best income of every day combined
+            budget = sum(max(row.bit_length() for row in menu['table'][-1]) - 1 for _, menu in day_menus)
+        income_mask = (1 << (budget + 1)) - 1
+        
+        # 2. Week DP over hours; 3. subset-sum over weekly incomes
+        week_days = [np.flatnonzero(weeks == week) for week in np.unique(weeks)]
+        week_states = []
+        horizon_states = [1]
+        for week, days in enumerate(week_days):
+            states = self._week_states(days, day_menus, int(weekly_caps[week]), income_mask)
+            week_states.append(states)
+            
+            week_incomes = 0
+            for row in states[-1]:
+                week_incomes |= row
+            
+            reachable = 0
+            for income in bits(week_incomes):
+                reachable |= horizon_states[-1] << income
+            horizon_states.append(reachable & income_mask)
+        
+        # Walk back from the largest reachable total
+        target = horizon_states[-1].bit_length() - 1
+        chosen = []
+        for week in range(len(week_days) - 1, -1, -1):
+            states = week_states[week]
+            for income in bits(_union(states[-1])):
+                if income <= target and (horizon_states[week] >> (target - income)) & 1:
+                    chosen.extend(self._trace_week(week_days[week], day_menus, states, income))
+                    target -= income
+                    break
+        
+        chosen = np.sort(np.array(chosen, dtype=np.intp))
+        solution_shifts = materialize_shifts(candidates[chosen], date_range, job_sources, confidence=0.95)
+        
+        objective_value = float(incomes[chosen].sum())
+        logger.info(f"Knapsack selected {len(solution_shifts)} shifts with income {objective_value}")
+        
+        return {
+            'shifts': solution_shifts,
+            'objective_value': objective_value,
+            'confidence_score': 0.95 if exact else 0.85,
+            'metadata': {
+                'algorithm': 'knapsack',
+                'exact': exact,
+                'income_bucket': bucket,
+                'income_states': budget + 1,
+                'distinct_day_menus': len(day_tables),
+                'num_candidates': len(candidates),
+                'presolve': presolve_stats,
+                'execution_time': time.time() - start_time
+            }
+        }
+    
+    def _income_resolution(self, incomes: np.ndarray, income_bound: float) -> Tuple[float, bool]:
+        """
+        Income bucket for the bitsets and whether it is exact.
+        
+        The bucket is the GCD of the (integer) shift incomes; it is coarsened
+        when the income bound would need more than max_income_states bits, in
+        which case incomes are rounded up so the schedule still fits the budget.
+        """
+        rounded = np.round(incomes).astype(np.int64)
+        exact = bool(np.allclose(incomes, rounded))
+        bucket = int(np.gcd.reduce(rounded[rounded > 0])) if exact and (rounded > 0).any() else 1
+        
+        if income_bound / bucket > self.max_income_states:
+            bucket = int(np.ceil(income_bound / self.max_income_states))
+            exact = exact and bool((rounded % bucket == 0).all())
+        return float(bucket), exact
+    
+    def _day_table(
+        self,
+        day_candidates: np.ndarray,
+        hour_weights: np.ndarray,
+        income_weights: np.ndarray,
+        daily_cap: int
+    ) -> Dict[str, Any]:
+        """
+        Weighted interval scheduling DP over one day, with income bitsets.
+        
+        table[i][h] has bit k set when the first i shifts (by end time) can
+        form a non-overlapping pattern of h hour units and k income buckets.
+        """
+        starts = day_candidates['start'].astype(int)
+        ends = starts + day_candidates['duration'].astype(int)
+        order = np.argsort(ends, kind='stable')
+        predecessors = np.searchsorted(ends[order], starts[order], side='right')
+        hours_sorted = hour_weights[order].tolist()
+        incomes_sorted = income_weights[order].tolist()
+        
+        table = [[1] + [0] * daily_cap]
+        for i in range(1, len(order) + 1):
+            row = list(table[-1])
+            weight = hours_sorted[i - 1]
+            previous = table[predecessors[i - 1]]
+            for hours in range(weight, daily_cap + 1):
+                if previous[hours - weight]:
+                    row[hours] |= previous[hours - weight] << incomes_sorted[i - 1]
+            table.append(row)
+        
+        return {
+            'order': order,
+            'predecessors': predecessors,
+            'hours': hours_sorted,
+            'incomes': incomes_sorted,
+            'table': table,
+            'options': day_options(table[-1])
+        }
+    
+    def _week_states(
+        self,
+        days: np.ndarray,
+        day_menus: List[Tuple[np.ndarray, Dict[str, Any]]],
+        weekly_cap: int,
+        income_mask: int
+    ) -> List[List[int]]:
+        """Hours-indexed income bitsets after each day of the week (index 0 = before the first day)."""
+        states = [[1] + [0] * weekly_cap]
+        for day in days:
+            options = day_menus[day][1]['options']
+            previous = states[-1]
+            current = [0] * (weekly_cap + 1)
+            for hours, reachable in enumerate(previous):
+                if not reachable:
+                    continue
+                for day_hours, day_income in options:
+                    if hours + day_hours <= weekly_cap:
+                        current[hours + day_hours] |= (reachable << day_income) & income_mask
+            states.append(current)
+        return states
+    
+    def _trace_week(
+        self,
+        days: np.ndarray,
+        day_menus: List[Tuple[np.ndarray, Dict[str, Any]]],
+        states: List[List[int]],
+        income: int
+    ) -> List[int]:
+        """Candidate positions of a week schedule with the given income."""
+        hours = next(h for h, row in enumerate(states[-1]) if (row >> income) & 1)
+        chosen = []
+        for step in range(len(days), 0, -1):
+            rows, menu = day_menus[days[step - 1]]
+            for day_hours, day_income in menu['options']:
+                if (
+                    day_hours <= hours and day_income <= income
+                    and (states[step - 1][hours - day_hours] >> (income - day_income)) & 1
+                ):
+                    chosen.extend(rows[self._trace_day(menu, day_hours, day_income)])
+                    hours -= day_hours
+                    income -= day_income
+                    break
+        return chosen
+    
+    def _trace_day(self, menu: Dict[str, Any], hours: int, income: int) -> List[int]:
+        """Day-local positions of a pattern with the given hours and income."""
+        table = menu['table']
+        chosen = []
+        i = len(menu['order'])
+        while i > 0:
+            if (table[i - 1][hours] >> income) & 1:
+                i -= 1
+                continue
+            
+            # Not reachable without shift i, so the pattern ends with it
+            chosen.append(int(menu['order'][i - 1]))
+            hours -= menu['hours'][i - 1]
+            income -= menu['incomes'][i - 1]
+            i = menu['predecessors'][i - 1]
+        return chosen
+    
+    def _empty_solution(self, reason: str) -> Dict[str, Any]:
+        """Return an empty result when no schedule could be produced."""
+        return {
+            'shifts': [],
+            'objective_value': 0,
+            'confidence_score': 0.1,
+            'metadata': {'algorithm': 'knapsack', 'reason': reason}
+        }
+
+
+def bits(bitset: int) -> List[int]:
+    """Positions of the set bits, ascending."""
+    positions = []
+    while bitset:
+        low = bitset & -bitset
+        positions.append(low.bit_length() - 1)
+        bitset ^= low
+    return positions
+
+
+def day_options(final_row: List[int]) -> List[Tuple[int, int]]:
+    """Every achievable (hour units, income buckets) pair of a day table."""
+    return [(hours, income) for hours, row in enumerate(final_row) for income in bits(row)]
+
+
+def _union(rows: List[int]) -> int:
+    union = 0
+    for row in rows:
+        union |= row
+    return union
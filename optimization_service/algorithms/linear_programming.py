@@ -4,13 +4,18 @@ Linear programming optimization algorithm for shift scheduling.
 """
 
 import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Tuple
 import uuid
 
 import numpy as np
 import pandas as pd
-from scipy.optimize import linprog
+from scipy import sparse
+from scipy.optimize import Bounds, LinearConstraint, linprog, milp
 from loguru import logger
 
 from models.optimization_models import (
@@ -18,13 +23,134 @@ from models.optimization_models import (
     ConstraintType,
     OptimizationPreferences
 )
+from utils.config import get_settings
+from algorithms.candidates import (
+    COARSE_STEP_MINUTES,
+    REFINEMENT_STEPS_MINUTES,
+    build_problem_candidates,
+    existing_shift_table,
+    job_shift_templates,
+    problem_limits,
+    prune_occupied,
+    prune_unavailable,
+    refine_candidates,
+    candidate_hours,
+    candidate_income,
+    constraint_limits,
+    job_hourly_rates,
+    materialize_shifts,
+    week_index
+)
+
+
+def _solve_week_subproblem(
+    objective_coefficients: np.ndarray,
+    incomes: np.ndarray,
+    constraint_matrix: Optional[sparse.csr_matrix],
+    constraint_bounds: Optional[np.ndarray],
+    income_cap: Optional[float],
+    deadline: Optional[float],
+    mip_gap: float
+) -> Optional[np.ndarray]:
+    """
+    Solve one week subproblem, under its share of the income budget if any.
+    
+    Weeks are small enough to always solve as 0/1 MILPs: rounding a
+    relaxation can break the daily caps and overlaps, and the uncoupled
+    weeks' incomes are the capacities the budget is split by.
+    
+    Module-level so it can run in a worker process. The solver gets the
+    time left until the deadline when the week starts (queued weeks start
+    late), and a week starting after the deadline is not solved. Returns
+    the selected columns, or None when the deadline had passed.
+    """
+    options = {}
+    if deadline is not None:
+        options['time_limit'] = deadline - time.time()
+        if options['time_limit'] <= 0:
+            return None
+    
+    if income_cap is not None:
+        income_row = sparse.csr_matrix(incomes.reshape(1, -1))
+        constraint_matrix = income_row if constraint_matrix is None else sparse.vstack(
+            [constraint_matrix, income_row], format='csr'
+        )
+        constraint_bounds = np.append(
+            constraint_bounds if constraint_bounds is not None else np.zeros(0), income_cap
+        )
+    
+    result = milp(
+        c=objective_coefficients,
+        integrality=np.ones(len(objective_coefficients)),
+        bounds=Bounds(0, 1),
+        constraints=[LinearConstraint(constraint_matrix, -np.inf, constraint_bounds)]
+        if constraint_matrix is not None else [],
+        options={**options, 'mip_rel_gap': mip_gap}
+    )
+    
+    # No incumbent (e.g. the time limit hit first): the empty week is always feasible
+    if result.x is None:
+        return np.zeros(len(objective_coefficients), dtype=bool)
+    return result.x > 0.5
+
+
+class ModelStructureCache:
+    """LRU cache of compiled candidate tables and constraint structures."""
+    
+    def __init__(self, max_bytes: int, ttl: int):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        """Return the cached value, dropping it if it outlived the TTL."""
+        entry = self.entries.get(key)
+        if entry is not None and time.monotonic() - entry['created_at'] > self.ttl:
+            self._evict(key)
+            entry = None
+        
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry['value']
+    
+    def put(self, key: Tuple, value: Dict[str, Any], nbytes: int) -> None:
+        """Insert a value and evict least recently used entries beyond the memory budget."""
+        if nbytes > self.max_bytes:
+            return
+        
+        if key in self.entries:
+            self._evict(key)
+        
+        self.entries[key] = {'value': value, 'nbytes': nbytes, 'created_at': time.monotonic()}
+        self.total_bytes += nbytes
+        
+        while self.total_bytes > self.max_bytes:
+            self._evict(next(iter(self.entries)))
+    
+    def _evict(self, key: Tuple) -> None:
+        entry = self.entries.pop(key)
+        self.total_bytes -= entry['nbytes']
 
 
 class LinearProgrammingOptimizer:
     """Linear programming optimizer for shift scheduling."""
     
-    def __init__(self):
+    def __init__(self, executor: Optional[Executor] = None):
         self.name = "Linear Programming Optimizer"
+        self.executor = executor
+        self.decomposition_mip_gap = 0.01  # per-week relative MIP gap unless convergence_threshold is set
+        self.settings = get_settings()
+        self.structure_cache = ModelStructureCache(
+            max_bytes=self.settings.max_memory_mb * 1024 * 1024,
+            ttl=self.settings.cache_ttl
+        )
         logger.info(f"Initialized {self.name}")
     
     async def optimize(
@@ -32,13 +158,21 @@ class LinearProgrammingOptimizer:
         problem_data: Dict[str, Any],
         objective: ObjectiveType,
         constraints: List[Any],
-        preferences: OptimizationPreferences
+        preferences: OptimizationPreferences,
+        warm_start: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """
         Optimize shift schedule using linear programming.
         
         This is a simplified implementation that demonstrates the core concepts.
         In a production system, you would use more sophisticated modeling.
+        
+        warm_start carries the previous candidate table and selection for the
+        same user (see ShiftOptimizer incremental mode). Candidates of the
+        'free_days' are then regenerated, every other column keeps its
+        previous value, and only the free columns and the rows they touch
+        are handed to the solver; when the kept columns leave no feasible
+        re-plan, the whole model is solved from scratch.
         """
         logger.info(f"Starting linear programming optimization with objective: {objective}")
         
@@ -47,43 +181,64 @@ class LinearProgrammingOptimizer:
             date_range = problem_data['date_range']
             job_sources = problem_data['job_sources']
             constraints_dict = problem_data['constraints']
-            existing_shifts = problem_data['existing_shifts']
+            
+            # Capped week subproblems are solved as MILPs, which limits the presolve
+            integral = preferences.integer_solution or preferences.decompose_by_week
             
             # Create decision variables
             # Variables: x[i,j,t] = 1 if we schedule shift i at job j on day t
-            variables = self._create_decision_variables(date_range, job_sources)
+            if warm_start is not None:
+                candidates, fixed_values = self._patch_decision_variables(warm_start, problem_data, integral)
+                structure = self._build_constraint_structure(candidates, constraints_dict, date_range)
+                presolve_stats = None
+                cache_status = 'bypassed'
+            else:
+                candidates, structure, presolve_stats, cache_status = self._compile_model(problem_data, integral)
+                fixed_values = None
             
             # Build objective function
             objective_coefficients = self._build_objective_function(
-                variables, job_sources, objective
+                candidates, job_sources, objective
             )
             
-            # Build constraints
-            constraint_matrix, constraint_bounds = self._build_constraints(
-                variables, constraints_dict, job_sources, date_range
-            )
+            if preferences.decompose_by_week and fixed_values is None:
+                # Per-week MILPs solved in parallel, the fuyou budget water-filled across weeks in up to three rounds
+                solution_vector, objective_fun, solver_metadata = await self._solve_decomposed(
+                    candidates, objective_coefficients, problem_data, preferences
+                )
+            else:
+                solution_vector, objective_fun, solver_metadata = self._solve_monolithic(
+                    candidates, structure, objective_coefficients, fixed_values, problem_data, preferences
+                )
             
-            # Solve linear program
-            result = linprog(
-                c=objective_coefficients,
-                A_ub=constraint_matrix,
-                b_ub=constraint_bounds,
-                bounds=[(0, 1) for _ in range(len(objective_coefficients))],
-                method='highs',
-                options={'maxiter': preferences.max_iterations or 1000}
-            )
+            if solution_vector is None and fixed_values is not None:
+                # The kept schedule no longer fits the new limits (e.g. a new existing shift uses the budget)
+                logger.info("Incremental re-plan infeasible around the previous schedule, re-planning from scratch")
+                return await self.optimize(problem_data, objective, constraints, preferences)
             
-            if not result.success:
-                logger.warning(f"Linear programming optimization failed: {result.message}")
+            if solution_vector is None:
+                logger.warning(f"Linear programming optimization failed: {solver_metadata['solver_status']}")
                 return self._create_fallback_solution(problem_data, objective)
             
+            if preferences.multigrid and fixed_values is None:
+                candidates, solution_vector, objective_fun, solver_metadata['multigrid'] = self._refine_solution(
+                    candidates, solution_vector, objective_fun, problem_data, objective, preferences
+                )
+            
+            if fixed_values is not None:
+                solver_metadata['incremental'] = {
+                    'changed_days': int(len(warm_start['changed_days'])),
+                    'free_columns': int(np.isnan(fixed_values).sum()),
+                    'fixed_columns': int((~np.isnan(fixed_values)).sum())
+                }
+            
             # Extract solution
             solution_shifts = self._extract_solution(
-                result.x, variables, job_sources, date_range
+                solution_vector, candidates, job_sources, date_range
             )
             
             # Calculate objective value
-            objective_value = -result.fun if objective == ObjectiveType.MAXIMIZE_INCOME else result.fun
+            objective_value = -objective_fun if objective == ObjectiveType.MAXIMIZE_INCOME else objective_fun
             
             return {
                 'shifts': solution_shifts,
@@ -91,205 +246,675 @@ class LinearProgrammingOptimizer:
                 'confidence_score': 0.9,
                 'metadata': {
                     'algorithm': 'linear_programming',
-                    'solver_status': result.message,
-                    'iterations': result.nit,
-                    'solver_time': result.get('solver_time', 0)
+                    'model_cache': cache_status,
+                    'presolve': presolve_stats,
+                    **solver_metadata
+                },
+                'model_state': {
+                    'candidates': candidates,
+                    'selected': solution_vector > 0.5
                 }
             }
-            
+        
         except Exception as e:
             logger.error(f"Linear programming optimization failed: {e}")
             return self._create_fallback_solution(problem_data, objective)
     
+    def _solve_monolithic(
+        self,
+        candidates: np.ndarray,
+        structure: Dict[str, Any],
+        objective_coefficients: np.ndarray,
+        fixed_values: Optional[np.ndarray],
+        problem_data: Dict[str, Any],
+        preferences: OptimizationPreferences
+    ) -> Tuple[Optional[np.ndarray], float, Dict[str, Any]]:
+        """Solve the whole horizon as one model, keeping fixed columns out of the solver."""
+        constraint_matrix, constraint_bounds = self._build_constraints(
+            structure, candidates, problem_limits(problem_data), problem_data['job_sources']
+        )
+        
+        # Keep only the free columns when re-planning from a previous incumbent
+        free_mask = np.ones(len(candidates), dtype=bool)
+        fixed_objective = 0.0
+        if fixed_values is not None:
+            free_mask = np.isnan(fixed_values)
+            fixed_objective = float(objective_coefficients[~free_mask] @ fixed_values[~free_mask])
+            objective_coefficients, constraint_matrix, constraint_bounds = self._restrict_to_free_columns(
+                objective_coefficients, constraint_matrix, constraint_bounds, fixed_values
+            )
+        
+        # Solve the relaxation, or the true MILP when integer solutions are requested
+        if not free_mask.any():
+            free_vector, objective_fun, solver_metadata = np.zeros(0), 0.0, {'solver_status': 'no free columns'}
+        elif preferences.integer_solution:
+            free_vector, objective_fun, solver_metadata = self._solve_integer(
+                objective_coefficients, constraint_matrix, constraint_bounds, preferences
+            )
+        else:
+            free_vector, objective_fun, solver_metadata = self._solve_relaxation(
+                objective_coefficients, constraint_matrix, constraint_bounds, preferences
+            )
+        
+        if free_vector is None:
+            return None, 0.0, solver_metadata
+        
+        solution_vector = np.zeros(len(candidates)) if fixed_values is None else np.nan_to_num(fixed_values)
+        solution_vector[free_mask] = free_vector
+        return solution_vector, objective_fun + fixed_objective, solver_metadata
+    
+    async def _solve_decomposed(
+        self,
+        candidates: np.ndarray,
+        objective_coefficients: np.ndarray,
+        problem_data: Dict[str, Any],
+        preferences: OptimizationPreferences
+    ) -> Tuple[Optional[np.ndarray], float, Dict[str, Any]]:
+        """
+        Solve per-ISO-week subproblems concurrently and coordinate the fuyou budget.
+        
+        Daily, weekly and overlap rows never span two weeks; only the fuyou
+        row couples the horizon. Every week is a small 0/1 MILP, first solved
+        without the fuyou row to learn how much income it can carry. If the
+        weeks together exceed the budget, the budget is water-filled across
+        weeks (equal shares, capped at each week's capacity) and the weeks
+        are solved again under their share. Budget left unspent is finally
+        offered to the capped weeks in turn.
+        
+        timeout is one deadline for the whole decomposition: each week gets
+        the time that remains when it starts, and once the deadline passes
+        no further round is started and the best schedule so far is kept.
+        """
+        deadline = time.time() + preferences.timeout if preferences.timeout else None
+        date_range = problem_data['date_range']
+        job_sources = problem_data['job_sources']
+        constraints_dict = problem_data['constraints']
+        limits = problem_limits(problem_data)
+        budget = limits['income']
+        
+        incomes = candidate_income(candidates, job_hourly_rates(job_sources))
+        week_constraints = {
+            constraint_type: constraint
+            for constraint_type, constraint in constraints_dict.items()
+            if constraint_type != ConstraintType.FUYOU_LIMIT
+        }
+        
+        # Build one subproblem per ISO week over week-local day offsets
+        weeks = week_index(date_range)
+        candidate_weeks = weeks[candidates['day']]
+        subproblems = []
+        for week in np.unique(weeks):
+            columns = np.flatnonzero(candidate_weeks == week)
+            if len(columns) == 0:
+                continue
+            
+            first_day = int(np.argmax(weeks == week))
+            num_days = int((weeks == week).sum())
+            week_range = date_range[first_day:first_day + num_days]
+            week_candidates = candidates[columns].copy()
+            week_candidates['day'] -= first_day
+            week_limits = {
+                'daily_hours': None if limits['daily_hours'] is None else limits['daily_hours'][first_day:first_day + num_days],
+                'weekly_hours': None if limits['weekly_hours'] is None else limits['weekly_hours'][week:week + 1],
+                'income': None
+            }
+            
+            structure = self._build_constraint_structure(week_candidates, week_constraints, week_range)
+            constraint_matrix, constraint_bounds = self._build_constraints(
+                structure, week_candidates, week_limits, job_sources
+            )
+            subproblems.append((columns, constraint_matrix, constraint_bounds))
+        
+        def week_income(position: int, selected: Optional[np.ndarray]) -> float:
+            return 0.0 if selected is None else float(incomes[subproblems[position][0]][selected].sum())
+        
+        def expired() -> bool:
+            return deadline is not None and time.time() >= deadline
+        
+        # Round 1: uncoupled weeks give each week's income capacity (weeks cut off by the deadline stay empty)
+        selections = await self._solve_subproblems(
+            subproblems, objective_coefficients, incomes, [None] * len(subproblems), preferences, deadline
+        )
+        timed_out = any(selected is None for selected in selections)
+        selections = [
+            np.zeros(len(columns), dtype=bool) if selected is None else selected
+            for (columns, _, _), selected in zip(subproblems, selections)
+        ]
+        week_incomes = np.array([week_income(position, selected) for position, selected in enumerate(selections)])
+        
+        rounds = 1
+        if budget is not None and week_incomes.sum() > budget:
+            # Round 2: re-solve every week under its share of the budget
+            capacities = week_incomes
+            allocations = self._allocate_budget(capacities, budget)
+            shared = [None] * len(subproblems)
+            if not expired():
+                shared = await self._solve_subproblems(
+                    subproblems, objective_coefficients, incomes, allocations.tolist(), preferences, deadline
+                )
+                rounds = 2
+            
+            # Weeks the deadline cut off keep their uncoupled schedule while it fits the budget left, else stay empty
+            week_incomes = np.array([week_income(position, selected) for position, selected in enumerate(shared)])
+            for position in [position for position, selected in enumerate(shared) if selected is None]:
+                timed_out = True
+                fits = week_incomes.sum() + capacities[position] <= budget
+                shared[position] = selections[position] if fits else np.zeros_like(selections[position])
+                week_incomes[position] = capacities[position] if fits else 0.0
+            selections = shared
+            
+            # Round 3: shares can be smaller than any whole shift (e.g. when existing
+            # shifts use most of the budget), so pass the unspent budget on to the
+            # capped weeks one at a time while a shift could still fit
+            min_income = incomes[incomes > 0].min() if (incomes > 0).any() else np.inf
+            for position in np.flatnonzero(allocations < capacities):
+                leftover = budget - week_incomes.sum()
+                if leftover < min_income or expired():
+                    break
+                
+                selected = (await self._solve_subproblems(
+                    [subproblems[position]], objective_coefficients, incomes,
+                    [week_incomes[position] + leftover], preferences, deadline
+                ))[0]
+                new_income = week_income(position, selected)
+                if new_income > week_incomes[position]:
+                    selections[position] = selected
+                    week_incomes[position] = new_income
+                rounds = 3
+        
+        solution_vector = np.zeros(len(candidates))
+        for (columns, _, _), selected in zip(subproblems, selections):
+            solution_vector[columns[selected]] = 1.0
+        
+        metadata = {
+            'solve_mode': 'week_decomposition',
+            'solver_status': 'decomposed',
+            'decomposition': {
+                'subproblems': len(subproblems),
+                'rounds': rounds,
+                'income_budget': budget,
+                'scheduled_income': float(week_incomes.sum()),
+                'parallel': self._use_process_pool(preferences),
+                'timed_out': timed_out or expired()
+            }
+        }
+        return solution_vector, float(objective_coefficients @ solution_vector), metadata
+    
+    def _allocate_budget(self, capacities: np.ndarray, budget: float) -> np.ndarray:
+        """Water-fill the income budget: equal shares, capped at each week's capacity."""
+        allocations = np.zeros(len(capacities))
+        remaining = budget
+        order = np.argsort(capacities)
+        for position, week in enumerate(order):
+            share = remaining / (len(order) - position)
+            allocations[week] = min(capacities[week], share)
+            remaining -= allocations[week]
+        return allocations
+    
+    async def _solve_subproblems(
+        self,
+        subproblems: List[Tuple[np.ndarray, Optional[sparse.csr_matrix], Optional[np.ndarray]]],
+        objective_coefficients: np.ndarray,
+        incomes: np.ndarray,
+        income_caps: List[Optional[float]],
+        preferences: OptimizationPreferences,
+        deadline: Optional[float]
+    ) -> List[Optional[np.ndarray]]:
+        """Solve every week subproblem, in the process pool when enabled (None for weeks past the deadline)."""
+        tasks = [
+            (
+                objective_coefficients[columns],
+                incomes[columns],
+                constraint_matrix,
+                constraint_bounds,
+                income_cap,
+                deadline,
+                preferences.convergence_threshold or self.decomposition_mip_gap
+            )
+            for (columns, constraint_matrix, constraint_bounds), income_cap in zip(subproblems, income_caps)
+        ]
+        
+        if not self._use_process_pool(preferences):
+            return [_solve_week_subproblem(*task) for task in tasks]
+        
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(*[
+            loop.run_in_executor(self.executor, _solve_week_subproblem, *task)
+            for task in tasks
+        ])
+    
+    def _use_process_pool(self, preferences: OptimizationPreferences) -> bool:
+        return self.executor is not None and preferences.enable_parallel
+    
+    def _refine_solution(
+        self,
+        candidates: np.ndarray,
+        solution_vector: np.ndarray,
+        objective_fun: float,
+        problem_data: Dict[str, Any],
+        objective: ObjectiveType,
+        preferences: OptimizationPreferences
+    ) -> Tuple[np.ndarray, np.ndarray, float, List[Dict[str, Any]]]:
+        """
+        Re-solve on finer start grids in windows around the selected shifts.
+        
+        Each level regenerates candidates at the next finer step only within
+        one coarser step of the shifts chosen so far, so the refined models
+        stay a small fraction of a full fine-grid model. The previous choice
+        is always part of the refined model, so a level never does worse.
+        """
+        date_range = problem_data['date_range']
+        job_sources = problem_data['job_sources']
+        
+        levels = []
+        window = COARSE_STEP_MINUTES
+        for step in REFINEMENT_STEPS_MINUTES:
+            selected = candidates[solution_vector > 0.5]
+            if len(selected) == 0:
+                break
+            
+            refined = prune_unavailable(
+                refine_candidates(selected, job_sources, step, window),
+                date_range, job_sources, problem_data.get('availability', [])
+            )
+            refined = prune_occupied(refined, date_range, problem_data.get('existing_shifts', []))
+            structure = self._build_constraint_structure(refined, problem_data['constraints'], date_range)
+            coefficients = self._build_objective_function(refined, job_sources, objective)
+            refined_vector, refined_fun, metadata = self._solve_monolithic(
+                refined, structure, coefficients, None, problem_data, preferences
+            )
+            if refined_vector is None:
+                logger.warning(f"Multigrid refinement at {step} minutes failed: {metadata['solver_status']}")
+                break
+            
+            candidates, solution_vector, objective_fun = refined, refined_vector, refined_fun
+            levels.append({'step_minutes': step, 'num_candidates': len(refined), 'objective_fun': refined_fun})
+            window = step
+        
+        return candidates, solution_vector, objective_fun, levels
+    
+    def _solve_relaxation(
+        self,
+        objective_coefficients: np.ndarray,
+        constraint_matrix: Optional[sparse.csr_matrix],
+        constraint_bounds: Optional[np.ndarray],
+        preferences: OptimizationPreferences
+    ) -> Tuple[Optional[np.ndarray], float, Dict[str, Any]]:
+        """Solve the continuous relaxation with bounds (0, 1); timeout, when set, is the solver time limit."""
+        # Simplex iterations grow with the row count, so the default limit does too
+        num_rows = len(constraint_bounds) if constraint_bounds is not None else 0
+        options = {'maxiter': preferences.max_iterations or max(1000, 2 * num_rows)}
+        if preferences.timeout:
+            options['time_limit'] = preferences.timeout
+        result = linprog(
+            c=objective_coefficients,
+            A_ub=constraint_matrix,
+            b_ub=constraint_bounds,
+            bounds=(0, 1),
+            method='highs',
+            options=options
+        )
+        
+        metadata = {
+            'solve_mode': 'relaxation',
+            'solver_status': result.message,
+            'iterations': result.nit,
+            'solver_time': result.get('solver_time', 0)
+        }
+        
+        if not result.success:
+            return None, 0.0, metadata
+        return result.x, result.fun, metadata
+    
+    def _solve_integer(
+        self,
+        objective_coefficients: np.ndarray,
+        constraint_matrix: Optional[sparse.csr_matrix],
+        constraint_bounds: Optional[np.ndarray],
+        preferences: OptimizationPreferences
+    ) -> Tuple[Optional[np.ndarray], float, Dict[str, Any]]:
+        """
+        Solve the model as a true 0/1 MILP with HiGHS branch-and-bound.
+        
+        preferences.timeout is the solver time limit and
+        preferences.convergence_threshold the relative MIP gap at which the
+        search stops. When the time limit is hit the incumbent is returned
+        together with the gap that was proven for it.
+        """
+        options = {'disp': False}
+        if preferences.timeout:
+            options['time_limit'] = preferences.timeout
+        if preferences.convergence_threshold:
+            options['mip_rel_gap'] = preferences.convergence_threshold
+        
+        linear_constraints = []
+        if constraint_matrix is not None:
+            linear_constraints.append(LinearConstraint(constraint_matrix, -np.inf, constraint_bounds))
+        
+        start_time = time.perf_counter()
+        result = milp(
+            c=objective_coefficients,
+            integrality=np.ones(len(objective_coefficients)),
+            bounds=Bounds(0, 1),
+            constraints=linear_constraints,
+            options=options
+        )
+        
+        metadata = {
+            'solve_mode': 'integer',
+            'solver_status': result.message,
+            'solver_time': time.perf_counter() - start_time,
+            'mip_gap': getattr(result, 'mip_gap', None),
+            'mip_dual_bound': getattr(result, 'mip_dual_bound', None),
+            'mip_node_count': getattr(result, 'mip_node_count', None),
+            'proven_optimal': result.status == 0
+        }
+        
+        # Status 1 is an iteration or time limit; keep the incumbent if one was found
+        if result.x is None or result.status not in (0, 1):
+            return None, 0.0, metadata
+        return np.round(result.x), result.fun, metadata
+    
     def _create_decision_variables(
         self,
-        date_range: pd.DatetimeIndex,
-        job_sources: Dict[str, Any]
-    ) -> List[Dict[str, Any]]:
-        """Create decision variables for the optimization problem."""
-        variables = []
-        
-        for date in date_range:
-            for job_id, job_source in job_sources.items():
-                # Create variables for different shift durations
-                for shift_duration in [4, 6, 8]:  # 4, 6, 8 hour shifts
-                    for start_hour in range(8, 20):  # 8 AM to 8 PM starts
-                        end_hour = start_hour + shift_duration
-                        if end_hour <= 22:  # End by 10 PM
-                            variables.append({
-                                'id': len(variables),
-                                'date': date.date(),
-                                'job_id': job_id,
-                                'job_source': job_source,
-                                'start_hour': start_hour,
-                                'end_hour': end_hour,
-                                'duration': shift_duration,
-                                'start_time': f"{start_hour:02d}:00",
-                                'end_time': f"{end_hour:02d}:00"
-                            })
-        
-        logger.info(f"Created {len(variables)} decision variables")
-        return variables
+        problem_data: Dict[str, Any],
+        integral: bool
+    ) -> Tuple[np.ndarray, Dict[str, int]]:
+        """
+        Create the candidate-shift table (one row per decision variable).
+        
+        The presolve drops unavailable and dominated candidates before any
+        row or column is built for them.
+        """
+        candidates, presolve_stats = build_problem_candidates(problem_data, integral)
+        
+        logger.info(f"Created {len(candidates)} decision variables ({presolve_stats['generated']} before presolve)")
+        return candidates, presolve_stats
+    
+    def _patch_decision_variables(
+        self,
+        warm_start: Dict[str, Any],
+        problem_data: Dict[str, Any],
+        integral: bool
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Keep the previous columns of fixed days and regenerate the free days.
+        
+        Free days get freshly presolved candidates, so nothing pruned or
+        refined (multigrid) for the previous run limits their re-plan; fixed
+        days keep the previous columns, which carry the incumbent. The
+        presolve needs the whole horizon, so candidates are still generated
+        for every day: the saving is in the solve, not in generation.
+        Returns the patched table and the fixed value of every column: the
+        previous incumbent outside the free days and NaN for the columns
+        the solver may change.
+        """
+        previous = warm_start['candidates']
+        free_days = warm_start['free_days']
+        
+        kept = ~np.isin(previous['day'], free_days)
+        fresh, _ = self._create_decision_variables(problem_data, integral)
+        fresh = fresh[np.isin(fresh['day'], free_days)]
+        
+        candidates = np.concatenate([previous[kept], fresh])
+        fixed_values = np.concatenate([warm_start['selected'][kept].astype(float), np.full(len(fresh), np.nan)])
+        
+        order = np.argsort(candidates['day'], kind='stable')
+        return candidates[order], fixed_values[order]
+    
+    def _restrict_to_free_columns(
+        self,
+        objective_coefficients: np.ndarray,
+        constraint_matrix: Optional[sparse.csr_matrix],
+        constraint_bounds: Optional[np.ndarray],
+        fixed_values: np.ndarray
+    ) -> Tuple[np.ndarray, Optional[sparse.csr_matrix], Optional[np.ndarray]]:
+        """Move fixed columns into the right-hand side and drop rows left without free columns."""
+        free_mask = np.isnan(fixed_values)
+        
+        if constraint_matrix is not None:
+            fixed = ~free_mask
+            constraint_bounds = constraint_bounds - constraint_matrix[:, fixed] @ fixed_values[fixed]
+            constraint_matrix = constraint_matrix[:, free_mask]
+            
+            active_rows = np.diff(constraint_matrix.indptr) > 0
+            constraint_matrix = constraint_matrix[active_rows]
+            constraint_bounds = constraint_bounds[active_rows]
+            if constraint_matrix.shape[0] == 0:
+                constraint_matrix, constraint_bounds = None, None
+        
+        return objective_coefficients[free_mask], constraint_matrix, constraint_bounds
     
     def _build_objective_function(
         self,
-        variables: List[Dict[str, Any]],
+        candidates: np.ndarray,
         job_sources: Dict[str, Any],
         objective: ObjectiveType
     ) -> np.ndarray:
         """Build the objective function coefficients."""
-        coefficients = []
+        if objective == ObjectiveType.MINIMIZE_HOURS:
+            # Minimize hours: coefficient = duration
+            return candidate_hours(candidates)
         
-        for var in variables:
-            job_source = var['job_source']
-            duration = var['duration']
-            
-            if objective == ObjectiveType.MAXIMIZE_INCOME:
-                # Maximize income: coefficient = hourly_rate * duration
-                coeff = job_source.hourly_rate * duration
-                coefficients.append(-coeff)  # Negative because linprog minimizes
-            elif objective == ObjectiveType.MINIMIZE_HOURS:
-                # Minimize hours: coefficient = duration
-                coefficients.append(duration)
-            else:
-                # Default: maximize income
-                coeff = job_source.hourly_rate * duration
-                coefficients.append(-coeff)
+        # Maximize income (default): coefficient = hourly_rate * duration,
+        # negative because linprog minimizes
+        return -candidate_income(candidates, job_hourly_rates(job_sources))
+    
+    def _compile_model(
+        self,
+        problem_data: Dict[str, Any],
+        integral: bool
+    ) -> Tuple[np.ndarray, Dict[str, Any], Dict[str, int], str]:
+        """
+        Return the candidate table, constraint structure and presolve statistics.
+        
+        Structurally identical problems (same horizon length and weekday
+        alignment, shift templates, availability, constraint types and
+        presolve inputs) share one compiled structure from the cache; only
+        the coefficient and RHS vectors are refreshed per request.
+        """
+        date_range = problem_data['date_range']
+        constraints_dict = problem_data['constraints']
         
-        return np.array(coefficients)
+        if not self.settings.enable_caching:
+            candidates, presolve_stats = self._create_decision_variables(problem_data, integral)
+            structure = self._build_constraint_structure(candidates, constraints_dict, date_range)
+            return candidates, structure, presolve_stats, 'disabled'
+        
+        key = self._structure_key(problem_data, integral)
+        cached = self.structure_cache.get(key)
+        if cached is not None:
+            logger.info(f"Reusing cached model structure with {len(cached['candidates'])} decision variables")
+            return cached['candidates'], cached['structure'], cached['presolve'], 'hit'
+        
+        candidates, presolve_stats = self._create_decision_variables(problem_data, integral)
+        structure = self._build_constraint_structure(candidates, constraints_dict, date_range)
+        
+        # Cached arrays are shared between requests and must never be modified in place
+        candidates.flags.writeable = False
+        matrix = structure['matrix']
+        nbytes = candidates.nbytes
+        if matrix is not None:
+            for array in (matrix.data, matrix.indices, matrix.indptr):
+                array.flags.writeable = False
+                nbytes += array.nbytes
+        
+        self.structure_cache.put(
+            key, {'candidates': candidates, 'structure': structure, 'presolve': presolve_stats}, nbytes
+        )
+        return candidates, structure, presolve_stats, 'miss'
     
-    def _build_constraints(
+    def _structure_key(self, problem_data: Dict[str, Any], integral: bool) -> Tuple:
+        """Cache key: horizon shape, shift templates, availability, constraint types and presolve inputs."""
+        date_range = problem_data['date_range']
+        job_ids = list(problem_data['job_sources'])
+        templates = repr([
+            (durations.tolist(), earliest, latest_end, interval)
+            for durations, earliest, latest_end, interval in job_shift_templates(problem_data['job_sources'])
+        ])
+        
+        # Job-specific slots are keyed by job position so users with different ids can share
+        availability = sorted(
+            (
+                slot.day_of_week,
+                slot.start_time,
+                slot.end_time,
+                slot.is_available,
+                job_ids.index(slot.job_source_id) if slot.job_source_id in job_ids else -1
+            )
+            for slot in problem_data.get('availability', [])
+        )
+        availability_fingerprint = hashlib.sha1(repr(availability).encode()).hexdigest()
+        
+        # The presolve depends on the objective, the rate ranking of the jobs, the daily cap
+        # and the time and hours of the existing shifts (income only moves the budget)
+        rate_ranks = np.unique(job_hourly_rates(problem_data['job_sources']), return_inverse=True)[1]
+        existing = existing_shift_table(problem_data.get('existing_shifts', []), date_range)
+        existing_fingerprint = hashlib.sha1(
+            repr(sorted(existing[['day', 'start', 'end', 'hours']].tolist())).encode()
+        ).hexdigest()
+        presolve_inputs = (
+            problem_data.get('objective'),
+            integral,
+            tuple(rate_ranks.tolist()),
+            constraint_limits(problem_data['constraints'], date_range)['daily_hours'],
+            existing_fingerprint
+        )
+        
+        return (
+            len(date_range),
+            date_range[0].dayofweek,
+            hashlib.sha1(templates.encode()).hexdigest(),
+            availability_fingerprint,
+            frozenset(problem_data['constraints']),
+            presolve_inputs
+        )
+    
+    def _build_constraint_structure(
         self,
-        variables: List[Dict[str, Any]],
+        candidates: np.ndarray,
         constraints_dict: Dict[str, Any],
-        job_sources: Dict[str, Any],
         date_range: pd.DatetimeIndex
-    ) -> Tuple[np.ndarray, np.ndarray]:
-        """Build constraint matrix and bounds."""
-        constraint_matrix = []
-        constraint_bounds = []
+    ) -> Dict[str, Any]:
+        """
+        Build the sparse constraint matrix and its row block layout.
+        
+        Rows are assembled in COO form straight from the integer index
+        columns of the candidate table (day, week and job), so build time and
+        memory scale with the number of nonzeros instead of rows x columns.
+        The income row is kept last with placeholder coefficients; rates and
+        right-hand sides are filled in by _build_constraints.
+        """
+        num_vars = len(candidates)
+        columns = np.arange(num_vars)
+        
+        day_idx = candidates['day'].astype(np.int64)
+        starts = candidates['start'].astype(np.int64)
+        durations = candidate_hours(candidates)
+        
+        week_idx = week_index(date_range)[day_idx]
+        
+        row_blocks, col_blocks, data_blocks, layout = [], [], [], []
+        num_rows = 0
+        
+        def add_rows(kind: str, row_idx: np.ndarray, col_idx: np.ndarray, values: np.ndarray, count: int) -> None:
+            nonlocal num_rows
+            row_blocks.append(row_idx + num_rows)
+            col_blocks.append(col_idx)
+            data_blocks.append(values)
+            layout.append((kind, count))
+            num_rows += count
         
         # 1. Daily hours constraint
         if ConstraintType.DAILY_HOURS in constraints_dict:
-            daily_limit = constraints_dict[ConstraintType.DAILY_HOURS].constraint_value
-            
-            # Group variables by date
-            dates = list(set(var['date'] for var in variables))
-            for date in dates:
-                constraint_row = []
-                for var in variables:
-                    if var['date'] == date:
-                        constraint_row.append(var['duration'])
-                    else:
-                        constraint_row.append(0)
-                
-                constraint_matrix.append(constraint_row)
-                constraint_bounds.append(daily_limit)
+            add_rows('daily_hours', day_idx, columns, durations, len(date_range))
         
         # 2. Weekly hours constraint
         if ConstraintType.WEEKLY_HOURS in constraints_dict:
-            weekly_limit = constraints_dict[ConstraintType.WEEKLY_HOURS].constraint_value
+            num_weeks = int(week_index(date_range)[-1]) + 1
+            add_rows('weekly_hours', week_idx, columns, durations, num_weeks)
+        
+        # 3. No overlapping shifts on same day
+        # Time-indexed formulation: at most one selected shift may cover any
+        # time slot of a day. Interval overlaps always contain the later start
+        # slot, so rows are only needed at (day, start slot) boundaries, which
+        # keeps the row count linear in the number of time slots.
+        if num_vars:
+            slot_minutes = int(np.gcd.reduce(np.concatenate([starts, candidates['duration']])))
+            slots_per_day = 24 * 60 // slot_minutes
+            start_slots = day_idx * slots_per_day + starts // slot_minutes
             
-            # Group variables by week
-            weeks = {}
-            for var in variables:
-                week = var['date'].isocalendar()[1]
-                if week not in weeks:
-                    weeks[week] = []
-                weeks[week].append(var['id'])
+            cover_counts = candidates['duration'].astype(np.int64) // slot_minutes
+            cover_cols = np.repeat(columns, cover_counts)
+            cover_offsets = np.arange(cover_counts.sum()) - np.repeat(np.cumsum(cover_counts) - cover_counts, cover_counts)
+            cover_slots = np.repeat(start_slots, cover_counts) + cover_offsets
             
-            for week, var_ids in weeks.items():
-                constraint_row = []
-                for var in variables:
-                    if var['id'] in var_ids:
-                        constraint_row.append(var['duration'])
-                    else:
-                        constraint_row.append(0)
-                
-                constraint_matrix.append(constraint_row)
-                constraint_bounds.append(weekly_limit)
+            boundary = np.isin(cover_slots, start_slots)
+            slot_ids, slot_rows = np.unique(cover_slots[boundary], return_inverse=True)
+            add_rows('overlap', slot_rows, cover_cols[boundary], np.ones(len(slot_rows)), len(slot_ids))
         
-        # 3. Fuyou limit constraint (income limit)
+        # 4. Fuyou limit constraint (income limit, prorated to the period); kept
+        # as the last row so its coefficients can be refreshed per request
         if ConstraintType.FUYOU_LIMIT in constraints_dict:
-            fuyou_limit = constraints_dict[ConstraintType.FUYOU_LIMIT].constraint_value
-            
-            # Convert to daily limit (assuming constraint is annual)
-            days_in_period = len(date_range)
-            daily_income_limit = fuyou_limit / (365 / days_in_period)
-            
-            constraint_row = []
-            for var in variables:
-                job_source = var['job_source']
-                income = job_source.hourly_rate * var['duration']
-                constraint_row.append(income)
-            
-            constraint_matrix.append(constraint_row)
-            constraint_bounds.append(daily_income_limit)
+            add_rows('income', np.zeros(num_vars, dtype=np.int64), columns, np.ones(num_vars), 1)
         
-        # 4. No overlapping shifts on same day
-        dates = list(set(var['date'] for var in variables))
-        for date in dates:
-            date_vars = [var for var in variables if var['date'] == date]
-            
-            # Check for overlapping time slots
-            for i, var1 in enumerate(date_vars):
-                for j, var2 in enumerate(date_vars):
-                    if i < j and self._shifts_overlap(var1, var2):
-                        constraint_row = [0] * len(variables)
-                        constraint_row[var1['id']] = 1
-                        constraint_row[var2['id']] = 1
-                        
-                        constraint_matrix.append(constraint_row)
-                        constraint_bounds.append(1)  # At most one of the overlapping shifts
-        
-        if not constraint_matrix:
-            # If no constraints, add a dummy constraint
-            constraint_matrix = [[0] * len(variables)]
-            constraint_bounds = [float('inf')]
-        
-        return np.array(constraint_matrix), np.array(constraint_bounds)
+        if num_rows == 0:
+            return {'matrix': None, 'layout': layout}
+        
+        constraint_matrix = sparse.coo_matrix(
+            (np.concatenate(data_blocks), (np.concatenate(row_blocks), np.concatenate(col_blocks))),
+            shape=(num_rows, num_vars)
+        ).tocsr()
+        
+        logger.info(f"Built {num_rows} constraint rows with {constraint_matrix.nnz} nonzeros")
+        return {'matrix': constraint_matrix, 'layout': layout}
     
-    def _shifts_overlap(self, var1: Dict[str, Any], var2: Dict[str, Any]) -> bool:
-        """Check if two shifts overlap in time."""
-        return not (var1['end_hour'] <= var2['start_hour'] or var2['end_hour'] <= var1['start_hour'])
+    def _build_constraints(
+        self,
+        structure: Dict[str, Any],
+        candidates: np.ndarray,
+        limits: Dict[str, Any],
+        job_sources: Dict[str, Any]
+    ) -> Tuple[Optional[sparse.csr_matrix], Optional[np.ndarray]]:
+        """
+        Fill income coefficients and right-hand sides into a constraint structure.
+        
+        limits holds the residual caps (see residual_limits): one daily cap
+        per day, one weekly cap per week and the remaining income budget.
+        """
+        constraint_matrix = structure['matrix']
+        if constraint_matrix is None:
+            return None, None
+        
+        limits = dict(limits, overlap=1)
+        constraint_bounds = np.concatenate([
+            np.broadcast_to(np.asarray(limits[kind], dtype=float), (count,)) for kind, count in structure['layout']
+        ])
+        
+        if structure['layout'][-1][0] == 'income':
+            # Swap in the income row without copying the (shared) sparsity pattern
+            data = constraint_matrix.data.copy()
+            row_start, row_end = constraint_matrix.indptr[-2], constraint_matrix.indptr[-1]
+            incomes = candidate_income(candidates, job_hourly_rates(job_sources))
+            data[row_start:row_end] = incomes[constraint_matrix.indices[row_start:row_end]]
+            constraint_matrix = sparse.csr_matrix(
+                (data, constraint_matrix.indices, constraint_matrix.indptr),
+                shape=constraint_matrix.shape
+            )
+        
+        return constraint_matrix, constraint_bounds
     
     def _extract_solution(
         self,
         solution_vector: np.ndarray,
-        variables: List[Dict[str, Any]],
+        candidates: np.ndarray,
         job_sources: Dict[str, Any],
         date_range: pd.DatetimeIndex
     ) -> List[Dict[str, Any]]:
         """Extract suggested shifts from the solution vector."""
-        suggested_shifts = []
-        
-        for i, value in enumerate(solution_vector):
-            if value > 0.5:  # Variable is selected (binary approximation)
-                var = variables[i]
-                job_source = var['job_source']
-                
-                # Calculate working hours (assuming 30 min break for shifts > 6 hours)
-                break_minutes = 30 if var['duration'] > 6 else 0
-                working_hours = var['duration'] - (break_minutes / 60)
-                calculated_earnings = working_hours * job_source.hourly_rate
-                
-                shift = {
-                    'job_source_id': var['job_id'],
-                    'job_source_name': job_source.name,
-                    'date': var['date'],
-                    'start_time': var['start_time'],
-                    'end_time': var['end_time'],
-                    'hourly_rate': job_source.hourly_rate,
-                    'break_minutes': break_minutes,
-                    'working_hours': working_hours,
-                    'calculated_earnings': calculated_earnings,
-                    'confidence': 0.9,
-                    'priority': 1,
-                    'reasoning': f"Optimized shift at {job_source.name} for {var['duration']} hours",
-                    'is_original': False
-                }
-                
-                suggested_shifts.append(shift)
+        # Variable is selected (binary approximation)
+        selected = candidates[solution_vector > 0.5]
+        suggested_shifts = materialize_shifts(selected, date_range, job_sources, confidence=0.9)
         
         logger.info(f"Extracted {len(suggested_shifts)} suggested shifts from solution")
         return suggested_shifts
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Process-pool population evaluation over shared memory.
+"""
+
+import pickle
+from collections import OrderedDict
+from concurrent.futures import Executor
+from multiprocessing import shared_memory
+from typing import Any, Tuple
+
+import numpy as np
+
+from models.optimization_models import ObjectiveType
+from algorithms.schedule_encoding import ScheduleEncoding
+
+# Shared blocks a worker process keeps attached, one per recent run
+MAX_ATTACHED_RUNS = 4
+_attached_runs: "OrderedDict[str, Tuple[shared_memory.SharedMemory, ScheduleEncoding, np.ndarray]]" = OrderedDict()
+
+
+class SharedPopulation:
+    """
+    One run's encoding and population buffer in a shared memory block.
+    
+    The encoding is pickled into the block once when the run starts. Each
+    generation only copies the population into the buffer, so workers are
+    sent nothing but the block name and the bounds of their shard.
+    """
+    
+    def __init__(self, encoding: ScheduleEncoding, population_size: int):
+        payload = pickle.dumps(encoding.evaluation_copy(), protocol=pickle.HIGHEST_PROTOCOL)
+        self.shape = (population_size,) + encoding.shape
+        self.payload_size = len(payload)
+        
+        self.block = shared_memory.SharedMemory(
+            create=True, size=self.payload_size + int(np.prod(self.shape)) * np.dtype(np.int16).itemsize
+        )
+        self.block.buf[:self.payload_size] = payload
+        self.population = np.ndarray(self.shape, dtype=np.int16, buffer=self.block.buf, offset=self.payload_size)
+    
+    @property
+    def handle(self) -> Tuple[str, int, Tuple[int, ...]]:
+        """What a worker needs to attach: block name, encoding size and buffer shape."""
+        return self.block.name, self.payload_size, self.shape
+    
+    def close(self) -> None:
+        """Release and remove the block; workers drop their attachments lazily."""
+        del self.population
+        self.block.close()
+        self.block.unlink()
+
+
+class ParallelEvaluator:
+    """
+    Shard population fitness evaluation across a persistent process pool.
+    
+    Used as a context manager around one run, which owns the shared block.
+    """
+    
+    def __init__(
+        self,
+        encoding: ScheduleEncoding,
+        population_size: int,
+        executor: Executor,
+        workers: int,
+        objective: ObjectiveType,
+        penalty_weight: float
+    ):
+        self.encoding = encoding
+        self.population_size = population_size
+        self.executor = executor
+        self.workers = workers
+        self.objective = objective
+        self.penalty_weight = penalty_weight
+        self.shared = None
+    
+    def __enter__(self) -> "ParallelEvaluator":
+        self.shared = SharedPopulation(self.encoding, self.population_size)
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.shared.close()
+        self.shared = None
+    
+    def evaluate(self, population: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Penalized fitness and violation of every individual, one shard per worker."""
+        self.shared.population[:len(population)] = population
+        bounds = np.linspace(0, len(population), self.workers + 1).astype(int)
+        
+        futures = [
+            self.executor.submit(
+                _evaluate_shard, self.shared.handle, int(start), int(stop), self.objective, self.penalty_weight
+            )
+            for start, stop in zip(bounds[:-1], bounds[1:])
+            if stop > start
+        ]
+        
+        fitness, violation = zip(*[future.result() for future in futures])
+        return np.concatenate(fitness), np.concatenate(violation)
+
+
+def _evaluate_shard(
+    handle: Tuple[str, int, Tuple[int, ...]],
+    start: int,
+    stop: int,
+    objective: ObjectiveType,
+    penalty_weight: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Worker entry point: evaluate population[start:stop] of a shared run."""
+    _, encoding, population = attach_shared(*handle)
+    return encoding.fitness(population[start:stop], objective, penalty_weight)
+
+
+def attach_shared(name: str, payload_size: int, shape: Tuple[int, ...]) -> Tuple[Any, ScheduleEncoding, np.ndarray]:
+    """Attach to a run's block once per worker, unpickling its encoding on first use."""
+    if name in _attached_runs:
+        _attached_runs.move_to_end(name)
+        return _attached_runs[name]
+    
+    block = shared_memory.SharedMemory(name=name)
+    encoding = pickle.loads(block.buf[:payload_size])
+    population = np.ndarray(shape, dtype=np.int16, buffer=block.buf, offset=payload_size)
+    _attached_runs[name] = (block, encoding, population)
+    
+    while len(_attached_runs) > MAX_ATTACHED_RUNS:
+        stale_block, _, stale_population = _attached_runs.popitem(last=False)[1]
+        del stale_population
+        stale_block.close()
+    
+    return _attached_runs[name]
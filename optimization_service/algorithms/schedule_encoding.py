@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+"""
+Array encoding of schedules for population-based optimizers.
+"""
+
+import copy
+from typing import Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from models.optimization_models import ObjectiveType
+from algorithms.candidates import (
+    build_problem_candidates,
+    candidate_hours,
+    candidate_income,
+    job_hourly_rates,
+    problem_limits,
+    week_index,
+    weekday_index
+)
+
+# Most shifts a single day can hold, whatever the caps allow
+MAX_SLOTS_PER_DAY = 4
+
+
+class ScheduleEncoding:
+    """
+    Integer genome encoding over the presolved candidate table.
+    
+    A schedule is an array of shape (days, slots): gene g on day d selects
+    the (g - 1)-th candidate shift offered on that day, and gene 0 leaves the
+    slot empty. A population is simply a stack of genomes with shape
+    (population, days, slots), so every operator and every evaluation runs
+    as one batched array operation over the whole population.
+    
+    Per-gene attribute tables have shape (days, options + 1) with column 0
+    describing the empty gene; they are gathered for a whole population with
+    one flat take per attribute.
+    """
+    
+    def __init__(self, problem_data: Dict[str, Any], candidates: np.ndarray):
+        self.candidates = candidates
+        date_range = problem_data['date_range']
+        num_days = len(date_range)
+        
+        # Candidates are sorted by day, so each day's options are a contiguous run
+        day_bounds = np.searchsorted(candidates['day'], np.arange(num_days + 1))
+        self.option_counts = np.diff(day_bounds)
+        max_options = int(self.option_counts.max()) if num_days else 0
+        
+        positions = day_bounds[:-1, np.newaxis] + np.arange(max_options)
+        self.options = np.where(np.arange(max_options) < self.option_counts[:, np.newaxis], positions, -1)
+        
+        rates = job_hourly_rates(problem_data['job_sources'])
+        self.hourly_rates = rates
+        self.num_jobs = len(rates)
+        
+        def gene_table(values: np.ndarray, empty: float) -> np.ndarray:
+            table = np.full((num_days, max_options + 1), empty, dtype=values.dtype)
+            table[:, 1:] = np.where(self.options >= 0, values[self.options.clip(0)], empty)
+            return table
+        
+        starts = candidates['start'].astype(np.int32)
+        self.gene_start = gene_table(starts, 0)
+        self.gene_end = gene_table(starts + candidates['duration'], 0)
+        self.gene_hours = gene_table(candidate_hours(candidates), 0.0)
+        self.gene_income = gene_table(candidate_income(candidates, rates), 0.0)
+        self.gene_job = gene_table(candidates['job'].astype(np.int32), -1)
+        self.row_offsets = (np.arange(num_days) * (max_options + 1))[:, np.newaxis]
+        
+        self.limits = problem_limits(problem_data)
+        self.weeks = week_index(date_range)
+        self.weekdays = weekday_index(date_range)
+        self.week_starts = np.flatnonzero(np.diff(self.weeks, prepend=-1))
+        
+        # Enough slots for the most non-overlapping shifts any day can hold under its cap
+        min_hours = candidate_hours(candidates).min() if len(candidates) else 1.0
+        day_cap = self.limits['daily_hours'].max() if self.limits['daily_hours'] is not None else 24.0
+        self.slots = int(np.clip(day_cap // min_hours, 1, MAX_SLOTS_PER_DAY))
+        self.shape = (num_days, self.slots)
+    
+    @classmethod
+    def from_problem(cls, problem_data: Dict[str, Any]) -> Tuple["ScheduleEncoding", Dict[str, int]]:
+        """Encoding over the presolved candidates of a problem, with the presolve statistics."""
+        candidates, presolve_stats = build_problem_candidates(problem_data, integral=True)
+        return cls(problem_data, candidates), presolve_stats
+    
+    def random_genes(self, rng: np.random.Generator, shape: Tuple[int, ...]) -> np.ndarray:
+        """Uniform random non-empty genes for arrays whose last two axes are (days, slots)."""
+        counts = self.option_counts[:, np.newaxis]
+        return (1 + rng.random(shape) * counts).astype(np.int16) * (counts > 0)
+    
+    def random_population(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        """
+        Random schedules of varied density.
+        
+        Each individual works the first slot of a day with its own
+        probability between 0 and 60% (later slots a third as often), so the
+        population spans sparse, feasible schedules up to dense ones.
+        """
+        shape = (size,) + self.shape
+        activity = rng.random((size, 1, 1)) * np.array([0.6] + [0.2] * (self.slots - 1))
+        return np.where(rng.random(shape) < activity, self.random_genes(rng, shape), 0).astype(np.int16)
+    
+    def greedy_population(self, rng: np.random.Generator, size: int, noise: float) -> np.ndarray:
+        """
+        Rate-ordered greedy schedules with randomized perturbations.
+        
+        Every individual visits the days in its own random order and fills
+        each day's slots in turn with the option of the highest hourly rate
+        that still fits: clear of the day's earlier picks and within the
+        daily, weekly and fuyou budgets it has left. Rates are scaled by
+        log-normal noise (sigma = noise) drawn per individual, day and
+        option, which breaks ties between durations and starts and now and
+        then prefers a lower-paying job. The schedules are feasible.
+        """
+        num_days = self.shape[0]
+        population = np.zeros((size,) + self.shape, dtype=np.int16)
+        individuals = np.arange(size)
+        
+        worked = self.gene_hours > 0
+        rates = np.maximum(self.gene_income, 1e-9) / np.where(worked, self.gene_hours, 1.0)
+        log_rates = np.where(worked, np.log(rates), -np.inf)
+        
+        num_weeks = int(self.weeks[-1]) + 1
+        daily_caps, weekly_caps = self.limits['daily_hours'], self.limits['weekly_hours']
+        daily_caps = daily_caps if daily_caps is not None else np.full(num_days, np.inf)
+        weekly_caps = weekly_caps if weekly_caps is not None else np.full(num_weeks, np.inf)
+        week_left = np.tile(weekly_caps, (size, 1))
+        budget_left = np.full(size, self.limits['income'] if self.limits['income'] is not None else np.inf)
+        
+        order = rng.permuted(np.tile(np.arange(num_days), (size, 1)), axis=1)
+        for step in range(num_days):
+            days = order[:, step]
+            weeks = self.weeks[days]
+            hours, income = self.gene_hours[days], self.gene_income[days]
+            starts, ends = self.gene_start[days], self.gene_end[days]
+            keys = log_rates[days] + noise * rng.standard_normal(hours.shape)
+            hours_left = np.minimum(daily_caps[days], week_left[individuals, weeks])
+            
+            for slot in range(self.slots):
+                fits = (hours <= hours_left[:, np.newaxis] + 1e-9) & (income <= budget_left[:, np.newaxis] + 1e-9)
+                candidates = np.where(fits, keys, -np.inf)
+                genes = candidates.argmax(axis=1)
+                genes = np.where(np.isfinite(candidates[individuals, genes]), genes, 0)
+                population[individuals, days, slot] = genes
+                
+                picked_hours = hours[individuals, genes]
+                hours_left -= picked_hours
+                week_left[individuals, weeks] -= picked_hours
+                budget_left -= income[individuals, genes]
+                
+                # Later slots only take options clear of this pick
+                pick_starts = starts[individuals, genes][:, np.newaxis]
+                pick_ends = ends[individuals, genes][:, np.newaxis]
+                keys[(starts < pick_ends) & (pick_starts < ends)] = -np.inf
+        
+        return population
+    
+    def repair(self, population: np.ndarray, touched: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Make every individual feasible in place; returns the flat positions of emptied genes.
+        
+        Shifts are only ever removed, lowest income first, so each step
+        keeps the earlier ones satisfied:
+        
+        1. of two overlapping slots on a day, the lower-income one is emptied;
+        2. a day over its cap loses its lowest-income shifts until it fits;
+        3. a week over its cap, and 4. a schedule over the fuyou budget, lose
+           their lowest-income shifts until the excess is covered.
+        
+        touched holds the flat positions of genes changed since the
+        population was last feasible: steps 1 and 2 then only revisit their
+        days, as days copied whole from feasible parents cannot break them.
+        """
+        num_days = self.shape[0]
+        day_genes = population.reshape(-1, self.slots)
+        if touched is None:
+            rows = np.arange(len(day_genes))
+        else:
+            owners, days, _ = np.unravel_index(touched, population.shape)
+            rows = np.unique(owners * num_days + days)
+        
+        genes = day_genes[rows]
+        index = genes.astype(np.intp) + self.row_offsets[rows % num_days]
+        income = self.gene_income.ravel().take(index)
+        hours = self.gene_hours.ravel().take(index)
+        starts = self.gene_start.ravel().take(index)
+        ends = self.gene_end.ravel().take(index)
+        
+        def empty(targets: np.ndarray, slot: np.ndarray) -> None:
+            genes[targets, slot] = 0
+            for values in (income, hours, starts, ends):
+                values[targets, slot] = 0
+        
+        # 1. Same-day overlaps (empty genes span 0-0 and never clash)
+        for a in range(self.slots):
+            for b in range(a + 1, self.slots):
+                clash = np.minimum(ends[:, a], ends[:, b]) > np.maximum(starts[:, a], starts[:, b])
+                keep_a = income[:, a] >= income[:, b]
+                empty(np.flatnonzero(clash & keep_a), b)
+                empty(np.flatnonzero(clash & ~keep_a), a)
+        
+        # 2. Daily caps
+        if self.limits['daily_hours'] is not None:
+            caps = self.limits['daily_hours'][rows % num_days]
+            for _ in range(self.slots):
+                over = np.flatnonzero(hours.sum(axis=1) > caps + 1e-9)
+                if not len(over):
+                    break
+                empty(over, np.argmin(np.where(genes[over] > 0, income[over], np.inf), axis=1))
+        
+        changed = genes != day_genes[rows]
+        emptied = [(rows[:, np.newaxis] * self.slots + np.arange(self.slots))[changed]]
+        day_genes[rows] = genes
+        
+        # 3. Weekly caps and 4. the fuyou budget, over the whole population
+        index = self.gene_index(population)
+        day_hours = self.slot_total(self.gene_hours, index)
+        income = self.slot_total(self.gene_income, index).sum(axis=1)
+        
+        if self.limits['weekly_hours'] is not None:
+            excess = np.add.reduceat(day_hours, self.week_starts, axis=1) - self.limits['weekly_hours']
+            if (excess > 1e-9).any():
+                dropped, dropped_income = self._trim_lowest(population, self.weeks, self.gene_hours, excess)
+                income -= np.bincount(
+                    dropped // (num_days * self.slots), weights=dropped_income, minlength=len(population)
+                )
+                emptied.append(dropped)
+        
+        if self.limits['income'] is not None:
+            excess = (income - self.limits['income'])[:, np.newaxis]
+            if (excess > 1e-9).any():
+                horizon = np.zeros(num_days, dtype=np.intp)
+                emptied.append(self._trim_lowest(population, horizon, self.gene_income, excess)[0])
+        
+        return np.concatenate(emptied)
+    
+    def _trim_lowest(
+        self,
+        population: np.ndarray,
+        day_groups: np.ndarray,
+        amounts: np.ndarray,
+        excess: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Empty the lowest-income genes of each group until its excess amount is covered.
+        
+        day_groups maps each day to a group (e.g. its week), excess has
+        shape (population, groups) and amounts is the per-gene attribute
+        table the excess is measured in. Returns the flat positions of the
+        emptied genes and their income. Like repair, this writes through
+        reshaped views, so the population must be contiguous.
+        """
+        num_days = self.shape[0]
+        day_genes = population.reshape(-1, self.slots)
+        rows = np.flatnonzero((excess > 1e-9)[:, day_groups])
+        genes = day_genes[rows]
+        worked = genes > 0
+        positions = (rows[:, np.newaxis] * self.slots + np.arange(self.slots))[worked]
+        genes = genes[worked]
+        
+        days = positions // self.slots % num_days
+        group = positions // (num_days * self.slots) * excess.shape[1] + day_groups.take(days)
+        gene_index = genes + self.row_offsets.ravel().take(days)
+        incomes = self.gene_income.ravel().take(gene_index)
+        # One sort key, group-major (much faster than lexsort)
+        order = np.argsort(group * (self.gene_income.max() + 1.0) + incomes)
+        positions, group, incomes = positions.take(order), group.take(order), incomes.take(order)
+        
+        # Amount already removed from the group before each gene
+        amount = amounts.ravel().take(gene_index.take(order))
+        before = np.cumsum(amount) - amount
+        before -= before[np.searchsorted(group, group)]
+        
+        dropped = before < excess.ravel()[group] - 1e-9
+        population.reshape(-1)[positions[dropped]] = 0
+        return positions[dropped], incomes[dropped]
+    
+    def gene_index(self, population: np.ndarray) -> np.ndarray:
+        """Flat positions of every gene of a population in the per-gene attribute tables."""
+        return population.astype(np.intp) + self.row_offsets
+    
+    def slot_total(self, table: np.ndarray, index: np.ndarray) -> np.ndarray:
+        """Attribute summed over the slots of each day, shape (population, days)."""
+        values = table.ravel().take(index)
+        total = values[..., 0].copy()
+        for slot in range(1, self.slots):
+            total += values[..., slot]
+        return total
+    
+    def aggregates(self, population: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Per-day and per-week aggregates of a population.
+        
+        day_hours, day_income and day_overlap (minutes of same-day overlap
+        between slots) have shape (population, days); week_hours has shape
+        (population, weeks).
+        """
+        index = self.gene_index(population)
+        day_hours = self.slot_total(self.gene_hours, index)
+        return {
+            'day_hours': day_hours,
+            'day_income': self.slot_total(self.gene_income, index),
+            'day_overlap': self._slot_overlap(index),
+            'week_hours': np.add.reduceat(day_hours, self.week_starts, axis=1)
+        }
+    
+    def evaluation_state(self, population: np.ndarray, objective: ObjectiveType) -> Dict[str, np.ndarray]:
+        """
+        Everything fitness is computed from, per individual.
+        
+        Besides week_hours, the state holds the totals fitness reads: hours,
+        income, overlap (hours), daily_excess and weekly_excess (hours over
+        the caps) and, for BALANCE_SOURCES, job_hours. Per-day aggregates
+        are not kept since a day's genes give them directly, so changing a
+        few days only moves the state by the difference on those days (see
+        apply_day_changes).
+        """
+        aggregates = self.aggregates(population)
+        state = {
+            'week_hours': aggregates['week_hours'],
+            'hours': aggregates['day_hours'].sum(axis=1),
+            'income': aggregates['day_income'].sum(axis=1),
+            'overlap': aggregates['day_overlap'].sum(axis=1) / 60,
+            'daily_excess': self._excess(aggregates['day_hours'], self.limits['daily_hours']).sum(axis=1),
+            'weekly_excess': self._excess(aggregates['week_hours'], self.limits['weekly_hours']).sum(axis=1)
+        }
+        if self._balances_jobs(objective):
+            state['job_hours'] = self.job_hours(population)
+        return state
+    
+    def apply_day_changes(
+        self,
+        state: Dict[str, np.ndarray],
+        individuals: np.ndarray,
+        days: np.ndarray,
+        before: np.ndarray,
+        after: np.ndarray
+    ) -> None:
+        """
+        Update evaluation states in place for days whose genes changed.
+        
+        individuals and days name distinct (individual, day) pairs; before
+        and after are their (pairs, slots) genes. Each pair costs a fixed
+        amount of work: its week hours and the totals move by the day's
+        difference, whatever the horizon length.
+        """
+        old = self.day_terms(days, before)
+        new = self.day_terms(days, after)
+        hours = new['hours'] - old['hours']
+        
+        np.add.at(state['hours'], individuals, hours)
+        np.add.at(state['income'], individuals, new['income'] - old['income'])
+        np.add.at(state['overlap'], individuals, (new['overlap'] - old['overlap']) / 60)
+        
+        if self.limits['daily_hours'] is not None:
+            caps = self.limits['daily_hours'][days]
+            np.add.at(
+                state['daily_excess'], individuals,
+                np.maximum(new['hours'] - caps, 0) - np.maximum(old['hours'] - caps, 0)
+            )
+        
+        # Several changed days can share a week
+        num_weeks = state['week_hours'].shape[1]
+        week_keys, inverse = np.unique(individuals * num_weeks + self.weeks[days], return_inverse=True)
+        week_owners, weeks = np.divmod(week_keys, num_weeks)
+        week_hours = state['week_hours'][week_owners, weeks]
+        week_change = np.bincount(inverse, weights=hours, minlength=len(week_keys))
+        if self.limits['weekly_hours'] is not None:
+            caps = self.limits['weekly_hours'][weeks]
+            np.add.at(
+                state['weekly_excess'], week_owners,
+                np.maximum(week_hours + week_change - caps, 0) - np.maximum(week_hours - caps, 0)
+            )
+        state['week_hours'][week_owners, weeks] = week_hours + week_change
+        
+        if 'job_hours' in state:
+            owners = np.broadcast_to(individuals[:, np.newaxis], before.shape)
+            for genes, sign in ((before, -1.0), (after, 1.0)):
+                index = genes.astype(np.intp) + self.row_offsets[days]
+                jobs = self.gene_job.ravel().take(index)
+                gene_hours = self.gene_hours.ravel().take(index)
+                worked = jobs >= 0
+                np.add.at(state['job_hours'], (owners[worked], jobs[worked]), sign * gene_hours[worked])
+    
+    def day_terms(self, days: np.ndarray, genes: np.ndarray) -> Dict[str, np.ndarray]:
+        """Hours, income and overlap (minutes) of (rows, slots) genes, row r on days[r]."""
+        index = genes.astype(np.intp) + self.row_offsets[days]
+        return {
+            'hours': self.slot_total(self.gene_hours, index),
+            'income': self.slot_total(self.gene_income, index),
+            'overlap': self._slot_overlap(index)
+        }
+    
+    def state_violation(self, state: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        Total constraint violation per individual, in hours.
+        
+        Hours over the daily and weekly caps and overlapping hours count as
+        they are; income over the fuyou budget is converted to hours at the
+        best hourly rate.
+        """
+        violation = state['overlap'] + state['daily_excess'] + state['weekly_excess']
+        if self.limits['income'] is not None:
+            violation = violation + np.maximum(state['income'] - self.limits['income'], 0) / self.hourly_rates.max()
+        return violation
+    
+    def state_scores(self, state: Dict[str, np.ndarray], objective: ObjectiveType) -> np.ndarray:
+        """
+        Objective value per individual, to be maximized.
+        
+        MINIMIZE_HOURS scores negative hours. BALANCE_SOURCES scores income
+        less the hours away from an even split between the job sources,
+        valued at the average rate; every other objective scores income.
+        """
+        if objective == ObjectiveType.MINIMIZE_HOURS:
+            return -state['hours']
+        if self._balances_jobs(objective):
+            job_hours = state['job_hours']
+            imbalance = np.abs(job_hours - job_hours.mean(axis=1, keepdims=True)).sum(axis=1)
+            return state['income'] - self.hourly_rates.mean() * imbalance
+        return state['income']
+    
+    def state_fitness(
+        self,
+        state: Dict[str, np.ndarray],
+        objective: ObjectiveType,
+        penalty_weight: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Penalized fitness and total violation (hours) of every individual.
+        
+        Violations cost penalty_weight times the objective value of an hour.
+        """
+        violation = self.state_violation(state)
+        return self.state_scores(state, objective) - penalty_weight * self.hour_value(objective) * violation, violation
+    
+    def fitness(
+        self,
+        population: np.ndarray,
+        objective: ObjectiveType,
+        penalty_weight: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Penalized fitness and total violation of a population, evaluated from scratch."""
+        return self.state_fitness(self.evaluation_state(population, objective), objective, penalty_weight)
+    
+    def job_hours(self, population: np.ndarray) -> np.ndarray:
+        """Hours per job source, shape (population, jobs)."""
+        index = self.gene_index(population)
+        jobs = self.gene_job.ravel().take(index)
+        hours = self.gene_hours.ravel().take(index)
+        return np.stack([(hours * (jobs == job)).sum(axis=(1, 2)) for job in range(self.num_jobs)], axis=1)
+    
+    def hour_value(self, objective: ObjectiveType) -> float:
+        """Objective units per hour, used to scale violation penalties."""
+        return 1.0 if objective == ObjectiveType.MINIMIZE_HOURS else float(self.hourly_rates.max())
+    
+    def evaluation_copy(self) -> "ScheduleEncoding":
+        """Shallow copy without the candidate table, all that evaluation needs (e.g. in worker processes)."""
+        clone = copy.copy(self)
+        clone.candidates = None
+        return clone
+    
+    def _slot_overlap(self, index: np.ndarray) -> np.ndarray:
+        """Minutes of overlap between the slots of each day, summing every pair of slots."""
+        overlap = np.zeros(index.shape[:-1])
+        if self.slots > 1:
+            # Empty genes span 0-0, so they never overlap anything
+            starts = self.gene_start.ravel().take(index)
+            ends = self.gene_end.ravel().take(index)
+            for a in range(self.slots):
+                for b in range(a + 1, self.slots):
+                    pair = np.minimum(ends[..., a], ends[..., b]) - np.maximum(starts[..., a], starts[..., b])
+                    overlap += np.maximum(pair, 0)
+        return overlap
+    
+    def _excess(self, hours: np.ndarray, caps: Optional[np.ndarray]) -> np.ndarray:
+        """Hours over per-day or per-week caps (none when the limit is absent)."""
+        if caps is None:
+            return np.zeros_like(hours)
+        return np.maximum(hours - caps, 0)
+    
+    def _balances_jobs(self, objective: ObjectiveType) -> bool:
+        return objective == ObjectiveType.BALANCE_SOURCES and self.num_jobs > 1
+    
+    def decode(self, genome: np.ndarray) -> np.ndarray:
+        """Candidate table positions selected by one genome, sorted."""
+        days, slots = np.nonzero(genome)
+        return np.unique(self.options[days, genome[days, slots] - 1])
+    
+    def encode(self, selected: np.ndarray) -> np.ndarray:
+        """
+        Genome of a schedule given as candidate rows, e.g. another engine's solution.
+        
+        Rows are matched to this encoding's options by (day, job, start,
+        duration); unmatched rows are dropped, as are shifts beyond a day's
+        slots (latest starts first). Overlaps and caps are left to repair.
+        """
+        genome = np.zeros(self.shape, dtype=np.int16)
+        if len(selected) == 0 or len(self.candidates) == 0:
+            return genome
+        
+        def keys(rows: np.ndarray) -> np.ndarray:
+            return ((rows['day'].astype(np.int64) * 256 + rows['job']) * 2048 + rows['start']) * 2048 + rows['duration']
+        
+        own_keys = keys(self.candidates)
+        order = np.argsort(own_keys)
+        found = np.searchsorted(own_keys, keys(selected), sorter=order).clip(0, len(order) - 1)
+        positions = order[found][own_keys[order[found]] == keys(selected)]
+        
+        # Number each day's shifts by start to place them in consecutive slots
+        positions = positions[np.lexsort((self.candidates['start'][positions], self.candidates['day'][positions]))]
+        days = self.candidates['day'][positions].astype(np.intp)
+        slots = np.arange(len(positions)) - np.searchsorted(days, days)
+        fits = slots < self.slots
+        genome[days[fits], slots[fits]] = positions[fits] - self.options[days[fits], 0] + 1
+        return genome
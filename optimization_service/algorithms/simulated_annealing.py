@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Simulated annealing over many vectorized chains for shift scheduling.
+"""
+
+import asyncio
+import time
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from models.optimization_models import (
+    ObjectiveType,
+    OptimizationPreferences
+)
+from utils.config import get_settings
+from algorithms.candidates import materialize_shifts
+from algorithms.schedule_encoding import ScheduleEncoding
+
+# Proposed move kinds (an empty slot always proposes an add)
+SWAP_JOB, SLIDE_START, DROP_SHIFT, ADD_SHIFT = range(4)
+
+
+class SimulatedAnnealingOptimizer:
+    """
+    Simulated annealing optimizer for shift scheduling.
+    
+    Runs many independent chains as one batch over the genome encoding of
+    the genetic algorithm (see ScheduleEncoding): every iteration, each
+    chain proposes one move on one (day, slot) -- swap the shift's job for
+    another offering the same window, slide its start to the neighbouring
+    start of the same job and length, drop it, or add a shift to an empty
+    slot -- and accepts it by the Metropolis rule at its own temperature.
+    Moves are scored by delta on the chains' evaluation states, so an
+    iteration costs the same whatever the horizon length.
+    """
+    
+    def __init__(self):
+        self.name = "Simulated Annealing Optimizer"
+        self.settings = get_settings()
+        self.max_iterations = self.settings.simulated_annealing_max_iter
+        self.chains = 64
+        self.penalty_weight = 2.0  # violation cost relative to the objective value of an hour
+        self.move_weights = (0.3, 0.4, 0.3)  # swap job, slide start, drop shift (filled slots)
+        self.temperature_spread = 16.0  # hottest to coolest chain starting temperature
+        self.final_temperature_ratio = 1e-3  # final temperature relative to the starting one
+        self.block_size = 256  # iterations per batch of random draws and deadline check
+        logger.info(f"Initialized {self.name}")
+    
+    async def optimize(
+        self,
+        problem_data: Dict[str, Any],
+        objective: ObjectiveType,
+        constraints: List[Any],
+        preferences: OptimizationPreferences
+    ) -> Dict[str, Any]:
+        """
+        Optimize shift schedule using simulated annealing.
+        
+        Chains start from repaired random schedules and cool geometrically;
+        max_iterations overrides the iteration count and timeout bounds the
+        run. The best feasible state over all chains is returned. The search
+        runs in a thread so the event loop stays free.
+        """
+        logger.info(f"Starting simulated annealing optimization with objective: {objective}")
+        start_time = time.time()
+        
+        encoding, presolve_stats = ScheduleEncoding.from_problem(problem_data)
+        if len(encoding.candidates) == 0:
+            return self._empty_solution('no_candidates')
+        
+        deadline = start_time + preferences.timeout if preferences.timeout else None
+        best_genome, anneal_metadata = await asyncio.to_thread(
+            self._anneal, encoding, objective, preferences.max_iterations or self.max_iterations,
+            np.random.default_rng(preferences.random_seed), deadline
+        )
+        
+        selected = encoding.candidates[encoding.decode(best_genome)]
+        solution_shifts = materialize_shifts(
+            selected, problem_data['date_range'], problem_data['job_sources'], confidence=0.8,
+            reasoning="Simulated annealing shift at {job_name} for {hours:g} hours"
+        )
+        
+        state = encoding.evaluation_state(best_genome[np.newaxis], objective)
+        score = float(encoding.state_scores(state, objective)[0])
+        objective_value = -score if objective == ObjectiveType.MINIMIZE_HOURS else score
+        
+        logger.info(f"Simulated annealing selected {len(solution_shifts)} shifts with objective {objective_value}")
+        
+        return {
+            'shifts': solution_shifts,
+            'objective_value': objective_value,
+            'confidence_score': 0.8,
+            'metadata': {
+                'algorithm': 'simulated_annealing',
+                'slots_per_day': encoding.slots,
+                'num_candidates': len(encoding.candidates),
+                'presolve': presolve_stats,
+                'execution_time': time.time() - start_time,
+                **anneal_metadata
+            }
+        }
+    
+    def _anneal(
+        self,
+        encoding: ScheduleEncoding,
+        objective: ObjectiveType,
+        iterations: int,
+        rng: np.random.Generator,
+        deadline: Optional[float]
+    ) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """Run all chains; returns the best feasible genome and run metadata."""
+        chains = np.arange(self.chains)
+        genomes = encoding.random_population(rng, self.chains)
+        encoding.repair(genomes)
+        state = encoding.evaluation_state(genomes, objective)
+        fitness, violation = encoding.state_fitness(state, objective, self.penalty_weight)
+        
+        # The empty schedule is feasible, so every chain has a best state
+        feasible = violation <= 1e-9
+        best_fitness = np.where(feasible, fitness, 0.0)
+        best_genomes = np.where(feasible[:, np.newaxis, np.newaxis], genomes, 0)
+        
+        temperatures = self._temperatures(encoding, objective)
+        cooling = self.final_temperature_ratio ** (1.0 / max(iterations, 1))
+        moves = self._move_tables(encoding)
+        days_with_options = np.flatnonzero(encoding.option_counts > 0)
+        
+        accepted = 0
+        completed = 0
+        stop_reason = 'max_iterations'
+        while completed < iterations:
+            block = min(self.block_size, iterations - completed)
+            days = days_with_options[rng.integers(len(days_with_options), size=(block, self.chains))]
+            slots = rng.integers(encoding.slots, size=(block, self.chains))
+            kinds = rng.choice(3, size=(block, self.chains), p=self.move_weights)
+            picks = rng.random((block, self.chains))
+            thresholds = np.log(rng.random((block, self.chains)))
+            
+            for step in range(block):
+                day, slot = days[step], slots[step]
+                before = genomes[chains, day]
+                genes = before[chains, slot]
+                proposal = self._propose(encoding, day, genes, kinds[step], picks[step], moves)
+                after = before.copy()
+                after[chains, slot] = proposal
+                
+                encoding.apply_day_changes(state, chains, day, before, after)
+                new_fitness, new_violation = encoding.state_fitness(state, objective, self.penalty_weight)
+                
+                # Metropolis: accept when log(u) < delta / T
+                accept = (new_fitness - fitness) >= thresholds[step] * temperatures
+                rejected = np.flatnonzero(~accept)
+                encoding.apply_day_changes(state, rejected, day[rejected], after[rejected], before[rejected])
+                
+                moved = np.flatnonzero(accept)
+                genomes[moved, day[moved], slot[moved]] = proposal[moved]
+                fitness[moved] = new_fitness[moved]
+                accepted += len(moved)
+                
+                improved = moved[(new_violation[moved] <= 1e-9) & (new_fitness[moved] > best_fitness[moved])]
+                best_fitness[improved] = new_fitness[improved]
+                best_genomes[improved] = genomes[improved]
+                
+                temperatures *= cooling
+            
+            completed += block
+            if deadline is not None and time.time() >= deadline:
+                stop_reason = 'timeout'
+                break
+        
+        best_chain = int(np.argmax(best_fitness))
+        return best_genomes[best_chain], {
+            'chains': self.chains,
+            'iterations': completed,
+            'stop_reason': stop_reason,
+            'acceptance_rate': accepted / max(completed * self.chains, 1),
+            'best_chain': best_chain,
+            'chain_best_fitness': best_fitness.tolist()
+        }
+    
+    def _propose(
+        self,
+        encoding: ScheduleEncoding,
+        days: np.ndarray,
+        genes: np.ndarray,
+        kinds: np.ndarray,
+        picks: np.ndarray,
+        moves: Dict[str, np.ndarray]
+    ) -> np.ndarray:
+        """New gene per chain for its move kind; empty slots propose adding a random option."""
+        kinds = np.where(genes == 0, ADD_SHIFT, kinds)
+        
+        # Rotate to another job of the same window (a no-op when the window has one job)
+        size = moves['swap_size'][days, genes]
+        rotation = 1 + (picks * np.maximum(size - 1, 1)).astype(np.int64)
+        position = (moves['swap_offset'][days, genes] + rotation) % size
+        swapped = moves['swap_members'][moves['swap_first'][days, genes] + position]
+        
+        slid = moves['slide'][(picks >= 0.5).astype(np.intp), days, genes]
+        added = 1 + (picks * encoding.option_counts[days]).astype(np.int64)
+        
+        return np.select(
+            [kinds == SWAP_JOB, kinds == SLIDE_START, kinds == DROP_SHIFT],
+            [swapped, slid, 0],
+            added
+        ).astype(genes.dtype)
+    
+    def _move_tables(self, encoding: ScheduleEncoding) -> Dict[str, np.ndarray]:
+        """
+        Neighbour genes for the swap and slide moves, indexed [day, gene].
+        
+        Options sharing a day and a (start, end) window form a swap group,
+        listed consecutively in swap_members: a gene's group starts at
+        swap_first, holds swap_size genes and the gene sits at swap_offset.
+        slide[0] and slide[1] are the previous and next start of the same
+        job and length (the gene itself at either end). Empty genes form
+        groups of one and slide to themselves.
+        """
+        num_days, width = encoding.gene_start.shape
+        days, genes = np.nonzero((np.arange(width) <= encoding.option_counts[:, np.newaxis]) & (np.arange(width) > 0))
+        starts = encoding.gene_start[days, genes].astype(np.int64)
+        ends = encoding.gene_end[days, genes].astype(np.int64)
+        jobs = encoding.gene_job[days, genes].astype(np.int64)
+        
+        order = np.lexsort((genes, ends, starts, days))
+        window = np.stack([days, starts, ends])[:, order]
+        first = np.flatnonzero(np.r_[True, (np.diff(window, axis=1) != 0).any(axis=0)])
+        sizes = np.diff(np.r_[first, len(order)])
+        group = np.repeat(np.arange(len(first)), sizes)
+        
+        moves = {
+            'swap_members': genes[order],
+            'swap_first': np.zeros((num_days, width), dtype=np.int64),
+            'swap_size': np.ones((num_days, width), dtype=np.int64),
+            'swap_offset': np.zeros((num_days, width), dtype=np.int64),
+            'slide': np.broadcast_to(np.arange(width), (2, num_days, width)).copy()
+        }
+        moves['swap_first'][days[order], genes[order]] = first[group]
+        moves['swap_size'][days[order], genes[order]] = sizes[group]
+        moves['swap_offset'][days[order], genes[order]] = np.arange(len(order)) - first[group]
+        
+        # Same day, job and length, consecutive by start
+        order = np.lexsort((starts, ends - starts, jobs, days))
+        run = np.stack([days, jobs, ends - starts])[:, order]
+        same = (np.diff(run, axis=1) == 0).all(axis=0)
+        earlier, later = order[:-1][same], order[1:][same]
+        moves['slide'][0, days[later], genes[later]] = genes[earlier]
+        moves['slide'][1, days[earlier], genes[earlier]] = genes[later]
+        return moves
+    
+    def _temperatures(self, encoding: ScheduleEncoding, objective: ObjectiveType) -> np.ndarray:
+        """
+        Starting temperature of each chain.
+        
+        Scaled to the objective value of a typical shift and spread
+        geometrically over temperature_spread, so cool chains refine while
+        hot ones explore.
+        """
+        typical_hours = float(np.median(encoding.gene_hours[:, 1:][encoding.options >= 0]))
+        base = encoding.hour_value(objective) * typical_hours
+        return base * self.temperature_spread ** -np.linspace(0, 1, self.chains)
+    
+    def _empty_solution(self, reason: str) -> Dict[str, Any]:
+        """Return an empty result when no schedule could be produced."""
+        return {
+            'shifts': [],
+            'objective_value': 0,
+            'confidence_score': 0.1,
+            'metadata': {'algorithm': 'simulated_annealing', 'reason': reason}
+        }
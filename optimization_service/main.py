@@ -358,20 +358,47 @@ async def get_available_algorithms() -> List[Dict[str, Any]]:
         {
             "id": AlgorithmType.SIMULATED_ANNEALING,
             "name": "Simulated Annealing",
-            "description": "Probabilistic optimization for escaping local optima",
+            "description": "Many annealing chains run as one batch, scoring each move by delta",
             "complexity": "medium",
-            "execution_time": "medium",
-            "suitable_for": ["complex_constraints"],
+            "execution_time": "fast",
+            "suitable_for": ["maximize_income", "minimize_hours", "balance_sources"],
             "tier_requirement": "standard"
         },
         {
             "id": AlgorithmType.MULTI_OBJECTIVE_NSGA2,
             "name": "NSGA-II Multi-Objective",
-            "description": "Advanced multi-objective optimization with Pareto solutions",
+            "description": "NSGA-II over income, work-life balance and job source balance, returning the Pareto front",
             "complexity": "high",
-            "execution_time": "slow",
+            "execution_time": "medium",
             "suitable_for": ["multi_objective"],
             "tier_requirement": "pro"
+        },
+        {
+            "id": AlgorithmType.CP_SAT,
+            "name": "CP-SAT Constraint Programming",
+            "description": "Exact interval scheduling with OR-Tools CP-SAT using parallel search workers",
+            "complexity": "high",
+            "execution_time": "medium",
+            "suitable_for": ["maximize_income", "minimize_hours"],
+            "tier_requirement": "pro"
+        },
+        {
+            "id": AlgorithmType.COLUMN_GENERATION,
+            "name": "Column Generation",
+            "description": "Day-pattern column generation priced from the master duals, for fine time grids and many job sources",
+            "complexity": "high",
+            "execution_time": "fast",
+            "suitable_for": ["maximize_income"],
+            "tier_requirement": "pro"
+        },
+        {
+            "id": AlgorithmType.KNAPSACK,
+            "name": "Multiple-Choice Knapsack",
+            "description": "Exact dynamic programming for income maximization under daily, weekly and fuyou limits",
+            "complexity": "medium",
+            "execution_time": "fast",
+            "suitable_for": ["maximize_income"],
+            "tier_requirement": "pro"
         }
     ]
     
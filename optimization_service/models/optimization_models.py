@@ -6,7 +6,7 @@ Pydantic models for optimization requests and responses.
 from datetime import datetime, date
 from typing import List, Dict, Any, Optional, Union
 from enum import Enum
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, confloat, validator
 
 
 class ConstraintType(str, Enum):
@@ -44,6 +44,9 @@ class AlgorithmType(str, Enum):
     GENETIC_ALGORITHM = "genetic_algorithm"
     SIMULATED_ANNEALING = "simulated_annealing"
     MULTI_OBJECTIVE_NSGA2 = "multi_objective_nsga2"
+    CP_SAT = "cp_sat"
+    COLUMN_GENERATION = "column_generation"
+    KNAPSACK = "knapsack"
 
 
 class TierLevel(str, Enum):
@@ -62,6 +65,44 @@ class ConstraintModel(BaseModel):
     metadata: Dict[str, Any] = Field(default_factory=dict)
 
 
+class ShiftTemplateModel(BaseModel):
+    """Model for the shifts a job source offers."""
+    durations: List[confloat(gt=0)] = Field(default=[4, 6, 8], min_length=1, description="Shift lengths in hours")
+    earliest_start: str = Field(default="08:00", pattern=r'^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$')
+    latest_end: str = Field(default="22:00", pattern=r'^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$')
+    start_interval_minutes: int = Field(default=15, ge=5, le=240, description="Finest boundary between allowed start times")
+    
+    @validator('durations')
+    def validate_durations(cls, v):
+        """Validate every duration is at least one minute long."""
+        for duration in v:
+            if round(duration * 60) < 1:
+                raise ValueError('Shift durations must be at least 1 minute')
+        
+        return v
+    
+    @validator('start_interval_minutes', always=True)
+    def validate_interval(cls, v, values):
+        """Validate every duration is a whole number of start intervals."""
+        for duration in values.get('durations') or []:
+            if round(duration * 60) % v:
+                raise ValueError('Shift durations must be multiples of start_interval_minutes')
+        
+        return v
+    
+    @validator('latest_end')
+    def validate_window(cls, v, values):
+        """Validate the window ends after it starts."""
+        earliest_start = values.get('earliest_start')
+        if earliest_start is not None:
+            start_hour, start_minute = map(int, earliest_start.split(':'))
+            end_hour, end_minute = map(int, v.split(':'))
+            if (end_hour, end_minute) <= (start_hour, start_minute):
+                raise ValueError('latest_end must be after earliest_start')
+        
+        return v
+
+
 class JobSourceModel(BaseModel):
     """Model for job sources."""
     id: str
@@ -70,6 +111,7 @@ class JobSourceModel(BaseModel):
     is_active: bool = True
     expected_monthly_hours: Optional[int] = None
     default_break_minutes: int = Field(ge=0, default=0)
+    shift_template: Optional[ShiftTemplateModel] = None
 
 
 class ExistingShiftModel(BaseModel):
@@ -102,6 +144,22 @@ class OptimizationPreferences(BaseModel):
     convergence_threshold: Optional[float] = Field(None, gt=0)
     enable_parallel: bool = True
     random_seed: Optional[int] = None
+    integer_solution: bool = Field(
+        False,
+        description="Solve linear programming models as a true MILP (timeout = time limit, convergence_threshold = MIP gap)"
+    )
+    incremental: bool = Field(
+        False,
+        description="Re-plan only the days affected by changes since the user's previous run"
+    )
+    decompose_by_week: bool = Field(
+        False,
+        description="Solve linear programming models week by week in parallel, coordinating the fuyou budget"
+    )
+    multigrid: bool = Field(
+        False,
+        description="Solve on the hourly start grid, then refine to 30- and 15-minute starts around the chosen shifts"
+    )
 
 
 class OptimizationRequest(BaseModel):
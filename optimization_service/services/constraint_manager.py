@@ -35,7 +35,7 @@ class ConstraintManager:
             ),
             TierLevel.STANDARD: TierLimits(
                 max_optimization_runs=50,
-                available_algorithms=['linear_programming', 'genetic_algorithm'],
+                available_algorithms=['linear_programming', 'genetic_algorithm', 'simulated_annealing'],
                 max_constraints=15,
                 max_time_horizon=90,
                 analytics_access=True,
@@ -44,7 +44,7 @@ class ConstraintManager:
             ),
             TierLevel.PRO: TierLimits(
                 max_optimization_runs=-1,
-                available_algorithms=['linear_programming', 'genetic_algorithm', 'multi_objective_nsga2'],
+                available_algorithms=['linear_programming', 'genetic_algorithm', 'simulated_annealing', 'multi_objective_nsga2', 'cp_sat', 'column_generation', 'knapsack'],
                 max_constraints=-1,
                 max_time_horizon=365,
                 analytics_access=True,
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Local-search polishing of optimization results.
+"""
+
+import time
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from models.optimization_models import ObjectiveType
+from algorithms.candidates import (
+    CANDIDATE_DTYPE,
+    MINUTES_PER_DAY,
+    availability_windows,
+    existing_shift_table,
+    job_hourly_rates,
+    job_shift_templates,
+    materialize_shifts,
+    problem_limits,
+    time_to_minutes,
+    week_index,
+    weekday_index
+)
+
+# Neither move can lower the hours worked, so MINIMIZE_HOURS results are left as they are
+POLISHED_OBJECTIVES = (ObjectiveType.MAXIMIZE_INCOME, ObjectiveType.BALANCE_SOURCES)
+
+# Engines whose objective value is the polisher's own score (ScheduleEncoding.state_scores);
+# every other engine reports scheduled income (or hours, which are never polished)
+SCORE_REPORTING_ALGORITHMS = ('genetic_algorithm', 'simulated_annealing')
+
+# Score gains and limit slack below this are rounding noise
+TOLERANCE = 1e-9
+
+
+class LocalSearchPolisher:
+    """
+    Bounded first-improvement local search over an engine's schedule.
+    
+    Whatever produced it -- rounded LP solutions, early-stopped evolutionary
+    runs, fallback heuristics -- a schedule is rarely locally optimal. Shift
+    by shift, the polisher tries to lengthen the shift to a longer duration
+    of its job (keeping its start or its end) and to hand it to another job
+    offering the same window, and applies the first move that raises the
+    score and keeps the schedule within the job's shift catalog, the
+    availability windows, the daily, weekly and fuyou limits and clear of
+    every other shift. Day and week hours, income and per-job hours are
+    kept as running totals, so each move is scored by delta. Passes repeat
+    until one finds no improvement, max_passes is reached or the time
+    budget runs out.
+    
+    The score is the genetic algorithm's (see ScheduleEncoding.state_scores):
+    scheduled income, less the hours away from an even split between the
+    job sources valued at the average rate under BALANCE_SOURCES.
+    """
+    
+    def __init__(self, time_budget_ms: int, max_passes: int = 10):
+        self.name = "Local Search Polisher"
+        self.time_budget_ms = time_budget_ms  # 0 disables polishing
+        self.max_passes = max_passes
+        logger.info(f"Initialized {self.name}")
+    
+    def polish(
+        self,
+        result: Dict[str, Any],
+        problem_data: Dict[str, Any],
+        objective: ObjectiveType
+    ) -> Dict[str, Any]:
+        """
+        Improve an optimizer result in place of its shifts.
+        
+        Returns a new result whose changed shifts are rebuilt and whose
+        metadata reports the search under 'local_search' (its 'gain' is in
+        the polisher's score units, and 'objective_value_before' keeps the
+        engine's value). When a move was applied, the objective value is
+        recomputed from the polished schedule in the engine's own units: the
+        score for SCORE_REPORTING_ALGORITHMS, scheduled income otherwise.
+        Shifts that cannot be placed in the date range (or are original
+        shifts) stay untouched.
+        """
+        if self.time_budget_ms <= 0 or objective not in POLISHED_OBJECTIVES or not result.get('shifts'):
+            return result
+        
+        start_time = time.time()
+        deadline = start_time + self.time_budget_ms / 1000
+        
+        positions, rows = self._schedule_table(result['shifts'], problem_data)
+        if len(rows) == 0:
+            return result
+        
+        state = self._initial_state(rows, problem_data, objective)
+        score = self._score(state, state['income'], state['job_hours'])
+        initial_score = score
+        
+        moves = {'extended': 0, 'reassigned': 0}
+        changed = np.zeros(len(rows), dtype=bool)
+        passes = 0
+        stop_reason = 'local_optimum'
+        while passes < self.max_passes:
+            passes += 1
+            improved = False
+            for shift in range(len(rows)):
+                if time.time() >= deadline:
+                    stop_reason = 'time_budget'
+                    break
+                
+                move = self._first_improvement(state, shift, score)
+                if move is not None:
+                    kind, score = move
+                    moves[kind] += 1
+                    changed[shift] = True
+                    improved = True
+            
+            if stop_reason == 'time_budget' or not improved:
+                break
+        else:
+            stop_reason = 'max_passes'
+        
+        gain = score - initial_score
+        objective_value = result.get('objective_value')
+        if changed.any():
+            reports_score = result.get('metadata', {}).get('algorithm') in SCORE_REPORTING_ALGORITHMS
+            objective_value = score if reports_score else float(state['income'])
+        
+        shifts = list(result['shifts'])
+        for shift in np.flatnonzero(changed):
+            original = shifts[positions[shift]]
+            shifts[positions[shift]] = materialize_shifts(
+                state['rows'][shift:shift + 1], problem_data['date_range'], problem_data['job_sources'],
+                confidence=original.get('confidence', 0.8),
+                reasoning="Local search improved shift at {job_name} for {hours:g} hours",
+                priority=original.get('priority', 1)
+            )[0]
+        
+        logger.info(f"Local search applied {sum(moves.values())} moves gaining {gain:.2f}")
+        
+        return {
+            **result,
+            'shifts': shifts,
+            'objective_value': objective_value,
+            'metadata': {
+                **result.get('metadata', {}),
+                'local_search': {
+                    **moves,
+                    'passes': passes,
+                    'gain': gain,
+                    'objective_value_before': result.get('objective_value'),
+                    'stop_reason': stop_reason,
+                    'time_ms': int((time.time() - start_time) * 1000)
+                }
+            }
+        }
+    
+    def _schedule_table(
+        self,
+        shifts: List[Dict[str, Any]],
+        problem_data: Dict[str, Any]
+    ) -> Tuple[List[int], np.ndarray]:
+        """Positions in the shift list and candidate rows of the shifts the search may move."""
+        date_range = problem_data['date_range']
+        job_ids = list(problem_data['job_sources'])
+        positions = []
+        rows = []
+        
+        for position, shift in enumerate(shifts):
+            if shift.get('is_original') or shift.get('job_source_id') not in job_ids:
+                continue
+            day = (pd.Timestamp(shift['date']) - date_range[0]).days
+            start = time_to_minutes(shift['start_time'])
+            end = time_to_minutes(shift['end_time'])
+            if not 0 <= day < len(date_range) or end <= start:
+                continue
+            positions.append(position)
+            rows.append((day, job_ids.index(shift['job_source_id']), start, end - start))
+        
+        return positions, np.array(rows, dtype=CANDIDATE_DTYPE)
+    
+    def _initial_state(
+        self,
+        rows: np.ndarray,
+        problem_data: Dict[str, Any],
+        objective: ObjectiveType
+    ) -> Dict[str, Any]:
+        """Running totals, limits and lookup tables of a schedule."""
+        date_range = problem_data['date_range']
+        job_sources = problem_data['job_sources']
+        rates = job_hourly_rates(job_sources)
+        hours = rows['duration'] / 60.0
+        weeks = week_index(date_range)
+        day_hours = np.bincount(rows['day'], weights=hours, minlength=len(date_range))
+        
+        # Per-minute availability prefix sums, so coverage checks are two lookups
+        windows = availability_windows(problem_data.get('availability', []), job_sources)
+        covered = None
+        if windows is not None:
+            covered = np.zeros(windows.shape[:2] + (MINUTES_PER_DAY + 1,), dtype=np.int32)
+            np.cumsum(windows, axis=2, out=covered[:, :, 1:])
+        
+        # Busy intervals per day: (start, end, shift), with -1 for existing shifts
+        busy: Dict[int, List[List[int]]] = {}
+        for day, start, end, _, _ in existing_shift_table(problem_data.get('existing_shifts', []), date_range).tolist():
+            busy.setdefault(day, []).append([start, end, -1])
+        for shift, (day, _, start, duration) in enumerate(rows.tolist()):
+            busy.setdefault(day, []).append([start, start + duration, shift])
+        
+        return {
+            'rows': rows.copy(),
+            'rates': rates,
+            'templates': job_shift_templates(job_sources),
+            'limits': problem_limits(problem_data),
+            'weeks': weeks,
+            'weekdays': weekday_index(date_range),
+            'covered': covered,
+            'busy': busy,
+            'day_hours': day_hours,
+            'week_hours': np.bincount(weeks, weights=day_hours, minlength=int(weeks[-1]) + 1),
+            'income': float((rates[rows['job']] * hours).sum()),
+            'job_hours': np.bincount(rows['job'], weights=hours, minlength=len(rates)),
+            'balance': objective == ObjectiveType.BALANCE_SOURCES and len(rates) > 1
+        }
+    
+    def _first_improvement(
+        self,
+        state: Dict[str, Any],
+        shift: int,
+        score: float
+    ) -> Optional[Tuple[str, float]]:
+        """Apply the first improving feasible move of one shift; returns its kind and the new score."""
+        day, job, start, duration = state['rows'][shift].tolist()
+        durations = state['templates'][job][0]
+        
+        # Shortest extension first, so later passes can keep lengthening
+        proposals = []
+        for longer in sorted(int(d) for d in durations if d > duration):
+            proposals.append(('extended', job, start, longer))
+            proposals.append(('extended', job, start + duration - longer, longer))
+        for other in range(len(state['rates'])):
+            if other != job:
+                proposals.append(('reassigned', other, start, duration))
+        
+        old_hours = duration / 60.0
+        for kind, new_job, new_start, new_duration in proposals:
+            new_hours = new_duration / 60.0
+            income = state['income'] - state['rates'][job] * old_hours + state['rates'][new_job] * new_hours
+            job_hours = state['job_hours'].copy()
+            job_hours[job] -= old_hours
+            job_hours[new_job] += new_hours
+            
+            new_score = self._score(state, income, job_hours)
+            if new_score <= score + TOLERANCE:
+                continue
+            if not self._feasible(state, shift, new_job, new_start, new_duration, new_hours - old_hours, income):
+                continue
+            
+            self._apply(state, shift, new_job, new_start, new_duration, new_hours - old_hours, income, job_hours)
+            return kind, new_score
+        
+        return None
+    
+    def _feasible(
+        self,
+        state: Dict[str, Any],
+        shift: int,
+        job: int,
+        start: int,
+        duration: int,
+        added_hours: float,
+        income: float
+    ) -> bool:
+        """Whether moving a shift to (job, start, duration) keeps the schedule within every limit."""
+        day = int(state['rows'][shift]['day'])
+        end = start + duration
+        limits = state['limits']
+        
+        week = state['weeks'][day]
+        if limits['income'] is not None and income > limits['income'] + TOLERANCE:
+            return False
+        if limits['daily_hours'] is not None:
+            if state['day_hours'][day] + added_hours > limits['daily_hours'][day] + TOLERANCE:
+                return False
+        if limits['weekly_hours'] is not None:
+            if state['week_hours'][week] + added_hours > limits['weekly_hours'][week] + TOLERANCE:
+                return False
+        
+        durations, earliest, latest_end, interval = state['templates'][job]
+        if duration not in durations or start < earliest or end > latest_end or (start - earliest) % interval:
+            return False
+        
+        covered = state['covered']
+        if covered is not None:
+            weekday = state['weekdays'][day]
+            if covered[weekday, job, end] - covered[weekday, job, start] != duration:
+                return False
+        
+        return not any(
+            other != shift and busy_start < end and start < busy_end
+            for busy_start, busy_end, other in state['busy'][day]
+        )
+    
+    def _apply(
+        self,
+        state: Dict[str, Any],
+        shift: int,
+        job: int,
+        start: int,
+        duration: int,
+        added_hours: float,
+        income: float,
+        job_hours: np.ndarray
+    ) -> None:
+        """Move a shift and update the running totals."""
+        day = int(state['rows'][shift]['day'])
+        state['rows'][shift] = (day, job, start, duration)
+        
+        state['day_hours'][day] += added_hours
+        state['week_hours'][state['weeks'][day]] += added_hours
+        state['income'] = income
+        state['job_hours'] = job_hours
+        for interval in state['busy'][day]:
+            if interval[2] == shift:
+                interval[0], interval[1] = start, start + duration
+    
+    def _score(self, state: Dict[str, Any], income: float, job_hours: np.ndarray) -> float:
+        """Schedule score from its income and hours per job."""
+        if not state['balance']:
+            return float(income)
+        imbalance = np.abs(job_hours - job_hours.mean()).sum()
+        return float(income - state['rates'].mean() * imbalance)
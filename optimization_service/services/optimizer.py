@@ -6,6 +6,8 @@ Core optimizer service for shift optimization algorithms.
 import asyncio
 import time
 import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Tuple
 import traceback
@@ -28,6 +30,12 @@ from models.optimization_models import (
 from algorithms.linear_programming import LinearProgrammingOptimizer
 from algorithms.genetic_algorithm import GeneticAlgorithmOptimizer
 from algorithms.multi_objective import MultiObjectiveOptimizer
+from algorithms.cp_sat import CPSatOptimizer
+from algorithms.column_generation import ColumnGenerationOptimizer
+from algorithms.knapsack import KnapsackOptimizer
+from algorithms.simulated_annealing import SimulatedAnnealingOptimizer
+from algorithms.candidates import week_index
+from services.local_search import LocalSearchPolisher
 from utils.config import get_settings
 
 
@@ -40,10 +48,26 @@ class ShiftOptimizer:
         self.completed_runs: Dict[str, OptimizationResponse] = {}
         self.metrics = OptimizationMetrics()
         
+        # Last linear programming model and solution per user_id, for incremental re-plans
+        self.incremental_states: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        
+        # Worker processes shared by the algorithms for CPU-bound parallel solves
+        self.process_pool = ProcessPoolExecutor(max_workers=self.settings.process_pool_workers or None)
+        
         # Initialize algorithm implementations
-        self.linear_optimizer = LinearProgrammingOptimizer()
-        self.genetic_optimizer = GeneticAlgorithmOptimizer()
+        # Engines that fall back to or seed from the LP share this one, and with it one model structure cache
+        self.linear_optimizer = LinearProgrammingOptimizer(executor=self.process_pool)
+        self.genetic_optimizer = GeneticAlgorithmOptimizer(
+            executor=self.process_pool, seed_optimizer=self.linear_optimizer
+        )
         self.multi_objective_optimizer = MultiObjectiveOptimizer()
+        self.cp_sat_optimizer = CPSatOptimizer(fallback_optimizer=self.linear_optimizer)
+        self.column_generation_optimizer = ColumnGenerationOptimizer()
+        self.knapsack_optimizer = KnapsackOptimizer(fallback_optimizer=self.linear_optimizer)
+        self.simulated_annealing_optimizer = SimulatedAnnealingOptimizer()
+        
+        # Passes run over every engine's result, in order, before it is converted
+        self.post_processors = [LocalSearchPolisher(self.settings.local_search_time_budget_ms)]
         
         logger.info("ShiftOptimizer initialized successfully")
     
@@ -88,7 +112,7 @@ class ShiftOptimizer:
             
             logger.info(f"Optimization {run_id} completed successfully in {processing_time_ms}ms")
             return response
-            
+        
         except Exception as e:
             logger.error(f"Optimization {run_id} failed: {e}")
             logger.error(f"Traceback: {traceback.format_exc()}")
@@ -115,6 +139,14 @@ class ShiftOptimizer:
             return await self._execute_genetic_algorithm(request)
         elif algorithm == AlgorithmType.MULTI_OBJECTIVE_NSGA2:
             return await self._execute_multi_objective(request)
+        elif algorithm == AlgorithmType.CP_SAT:
+            return await self._execute_cp_sat(request)
+        elif algorithm == AlgorithmType.COLUMN_GENERATION:
+            return await self._execute_column_generation(request)
+        elif algorithm == AlgorithmType.KNAPSACK:
+            return await self._execute_knapsack(request)
+        elif algorithm == AlgorithmType.SIMULATED_ANNEALING:
+            return await self._execute_simulated_annealing(request)
         else:
             raise ValueError(f"Unsupported algorithm: {algorithm}")
     
@@ -127,14 +159,28 @@ class ShiftOptimizer:
         # Extract problem data
         problem_data = self._extract_problem_data(request)
         
+        # Re-plan only what changed since this user's previous run
+        warm_start = None
+        if request.preferences.incremental:
+            warm_start = self._build_warm_start(request, problem_data)
+        
         # Execute optimization
         result = await self.linear_optimizer.optimize(
             problem_data,
             request.objective,
             request.constraints,
-            request.preferences
+            request.preferences,
+            warm_start=warm_start
         )
         
+        # Only users who opted into incremental re-plans have state kept between runs.
+        # Their schedules are not polished: the stored solution must be the one returned
+        model_state = result.pop('model_state', None)
+        if request.preferences.incremental:
+            self._store_incremental_state(request, model_state)
+        else:
+            result = self._post_process(result, problem_data, request)
+        
         # Convert result to solution format
         solution = self._convert_to_solution(
             result,
@@ -163,6 +209,8 @@ class ShiftOptimizer:
             request.preferences
         )
         
+        result = self._post_process(result, problem_data, request)
+        
         # Convert result to solution format
         solution = self._convert_to_solution(
             result,
@@ -191,6 +239,8 @@ class ShiftOptimizer:
             request.preferences
         )
         
+        # No polishing: the schedule is a Pareto front member, which a single-score search would pull off the front
+        
         # Convert result to solution format
         solution = self._convert_to_solution(
             result,
@@ -202,6 +252,226 @@ class ShiftOptimizer:
         logger.info(f"Multi-objective optimization completed with objective value: {solution.objective_value}")
         return solution
     
+    async def _execute_cp_sat(self, request: OptimizationRequest) -> OptimizationSolution:
+        """Execute CP-SAT constraint programming optimization."""
+        logger.info("Executing CP-SAT optimization")
+        
+        start_time = time.time()
+        
+        # Extract problem data
+        problem_data = self._extract_problem_data(request)
+        
+        # Execute optimization
+        result = await self.cp_sat_optimizer.optimize(
+            problem_data,
+            request.objective,
+            request.constraints,
+            request.preferences
+        )
+        
+        result = self._post_process(result, problem_data, request)
+        
+        # Convert result to solution format
+        solution = self._convert_to_solution(
+            result,
+            request,
+            AlgorithmType.CP_SAT,
+            int((time.time() - start_time) * 1000)
+        )
+        
+        logger.info(f"CP-SAT optimization completed with objective value: {solution.objective_value}")
+        return solution
+    
+    async def _execute_column_generation(self, request: OptimizationRequest) -> OptimizationSolution:
+        """Execute column generation optimization."""
+        logger.info("Executing column generation optimization")
+        
+        start_time = time.time()
+        
+        # Extract problem data
+        problem_data = self._extract_problem_data(request)
+        
+        # Execute optimization
+        result = await self.column_generation_optimizer.optimize(
+            problem_data,
+            request.objective,
+            request.constraints,
+            request.preferences
+        )
+        
+        result = self._post_process(result, problem_data, request)
+        
+        # Convert result to solution format
+        solution = self._convert_to_solution(
+            result,
+            request,
+            AlgorithmType.COLUMN_GENERATION,
+            int((time.time() - start_time) * 1000)
+        )
+        
+        logger.info(f"Column generation optimization completed with objective value: {solution.objective_value}")
+        return solution
+    
+    async def _execute_knapsack(self, request: OptimizationRequest) -> OptimizationSolution:
+        """Execute multiple-choice knapsack optimization."""
+        logger.info("Executing knapsack optimization")
+        
+        start_time = time.time()
+        
+        # Extract problem data
+        problem_data = self._extract_problem_data(request)
+        
+        # Execute optimization
+        result = await self.knapsack_optimizer.optimize(
+            problem_data,
+            request.objective,
+            request.constraints,
+            request.preferences
+        )
+        
+        result = self._post_process(result, problem_data, request)
+        
+        # Convert result to solution format
+        solution = self._convert_to_solution(
+            result,
+            request,
+            AlgorithmType.KNAPSACK,
+            int((time.time() - start_time) * 1000)
+        )
+        
+        logger.info(f"Knapsack optimization completed with objective value: {solution.objective_value}")
+        return solution
+    
+    async def _execute_simulated_annealing(self, request: OptimizationRequest) -> OptimizationSolution:
+        """Execute simulated annealing optimization."""
+        logger.info("Executing simulated annealing optimization")
+        
+        start_time = time.time()
+        
+        # Extract problem data
+        problem_data = self._extract_problem_data(request)
+        
+        # Execute optimization
+        result = await self.simulated_annealing_optimizer.optimize(
+            problem_data,
+            request.objective,
+            request.constraints,
+            request.preferences
+        )
+        
+        result = self._post_process(result, problem_data, request)
+        
+        # Convert result to solution format
+        solution = self._convert_to_solution(
+            result,
+            request,
+            AlgorithmType.SIMULATED_ANNEALING,
+            int((time.time() - start_time) * 1000)
+        )
+        
+        logger.info(f"Simulated annealing completed with objective value: {solution.objective_value}")
+        return solution
+    
+    def _post_process(
+        self,
+        result: Dict[str, Any],
+        problem_data: Dict[str, Any],
+        request: OptimizationRequest
+    ) -> Dict[str, Any]:
+        """Run the post-optimization passes (e.g. local-search polishing) over an engine's result."""
+        for processor in self.post_processors:
+            result = processor.polish(result, problem_data, request.objective)
+        return result
+    
+    def _build_warm_start(
+        self,
+        request: OptimizationRequest,
+        problem_data: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Diff the request against the user's previous run.
+        
+        Returns the previous model state together with the days that changed
+        (existing shifts or availability) and the days that may be re-planned
+        (the ISO weeks containing a changed day). Returns None when the runs
+        are not comparable or a constraint value changed: new limits change
+        the presolve of every day, so the whole model is rebuilt.
+        """
+        state = self.incremental_states.get(request.user_id)
+        if state is None:
+            return None
+        
+        previous: OptimizationRequest = state['request']
+        if (
+            previous.time_range != request.time_range
+            or previous.objective != request.objective
+            or previous.job_sources != request.job_sources
+            or previous.preferences.integer_solution != request.preferences.integer_solution
+            or previous.preferences.multigrid != request.preferences.multigrid
+            or previous.preferences.decompose_by_week != request.preferences.decompose_by_week
+            or {c.constraint_type for c in previous.constraints} != {c.constraint_type for c in request.constraints}
+        ):
+            return None
+        
+        date_range = problem_data['date_range']
+        dates = date_range.date
+        weekdays = (date_range.dayofweek.to_numpy() + 1) % 7  # 0=Sunday, as in AvailabilitySlotModel
+        changed = np.zeros(len(date_range), dtype=bool)
+        
+        previous_shifts = {shift.json() for shift in previous.existing_shifts}
+        current_shifts = {shift.json() for shift in request.existing_shifts}
+        changed_dates = {
+            shift.date
+            for shift in previous.existing_shifts + request.existing_shifts
+            if (shift.json() in previous_shifts) != (shift.json() in current_shifts)
+        }
+        changed |= np.isin(dates, list(changed_dates))
+        
+        previous_slots = {slot.json() for slot in previous.availability}
+        current_slots = {slot.json() for slot in request.availability}
+        changed_weekdays = {
+            slot.day_of_week
+            for slot in previous.availability + request.availability
+            if (slot.json() in previous_slots) != (slot.json() in current_slots)
+        }
+        changed |= np.isin(weekdays, list(changed_weekdays))
+        
+        previous_values = {c.constraint_type: c.constraint_value for c in previous.constraints}
+        if any(previous_values[c.constraint_type] != c.constraint_value for c in request.constraints):
+            logger.info(f"Constraint values changed for user {request.user_id}, re-planning from scratch")
+            return None
+        
+        changed_days = np.flatnonzero(changed)
+        weeks = week_index(date_range)
+        free_days = np.flatnonzero(np.isin(weeks, weeks[changed_days]))
+        
+        logger.info(
+            f"Incremental re-plan for user {request.user_id}: "
+            f"{len(changed_days)} changed days, {len(free_days)} free days"
+        )
+        
+        return {
+            'candidates': state['candidates'],
+            'selected': state['selected'],
+            'changed_days': changed_days,
+            'free_days': free_days
+        }
+    
+    def _store_incremental_state(
+        self,
+        request: OptimizationRequest,
+        model_state: Optional[Dict[str, Any]]
+    ) -> None:
+        """Remember the latest model and solution for the user (LRU bounded)."""
+        if model_state is None:
+            self.incremental_states.pop(request.user_id, None)
+            return
+        
+        self.incremental_states[request.user_id] = {'request': request, **model_state}
+        self.incremental_states.move_to_end(request.user_id)
+        while len(self.incremental_states) > self.settings.incremental_state_limit:
+            self.incremental_states.popitem(last=False)
+    
     def _extract_problem_data(self, request: OptimizationRequest) -> Dict[str, Any]:
         """Extract and structure problem data for optimization algorithms."""
         start_date = datetime.fromisoformat(request.time_range['start'].replace('Z', '+00:00')).date()
@@ -226,10 +496,12 @@ class ShiftOptimizer:
             'date_range': date_range,
             'job_sources': job_sources,
             'existing_shifts': request.existing_shifts,
+            'availability': request.availability,
             'availability_matrix': availability_matrix,
             'constraints': constraints_dict,
             'objective': request.objective,
-            'user_id': request.user_id
+            'user_id': request.user_id,
+            'tier_level': request.tier_level
         }
     
     def _create_availability_matrix(self, date_range: pd.DatetimeIndex, availability: List) -> pd.DataFrame:
@@ -439,5 +711,7 @@ class ShiftOptimizer:
         # Clear data
         self.active_runs.clear()
         self.completed_runs.clear()
+        self.incremental_states.clear()
+        self.process_pool.shutdown(cancel_futures=True)
         
         logger.info("Optimizer cleanup completed")
\ No newline at end of file
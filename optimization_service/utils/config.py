@@ -46,12 +46,18 @@ class Settings(BaseSettings):
     linear_programming_solver: str = Field(default="ECOS", env="LINEAR_PROGRAMMING_SOLVER")
     genetic_algorithm_population: int = Field(default=50, env="GA_POPULATION")
     genetic_algorithm_generations: int = Field(default=100, env="GA_GENERATIONS")
+    genetic_algorithm_islands: int = Field(default=4, env="GA_ISLANDS")  # PRO long horizons; 1 disables
+    genetic_algorithm_migration_interval: int = Field(default=10, env="GA_MIGRATION_INTERVAL")  # generations
+    fitness_cache_entries: int = Field(default=20000, env="FITNESS_CACHE_ENTRIES")  # genomes memoized per run
     simulated_annealing_max_iter: int = Field(default=1000, env="SA_MAX_ITER")
+    local_search_time_budget_ms: int = Field(default=200, env="LOCAL_SEARCH_TIME_BUDGET_MS")  # polishing pass; 0 disables
+    process_pool_workers: int = Field(default=0, env="PROCESS_POOL_WORKERS")  # 0 = one per CPU
     
     # Memory and performance
     max_memory_mb: int = Field(default=1024, env="MAX_MEMORY_MB")
     enable_caching: bool = Field(default=True, env="ENABLE_CACHING")
     cache_ttl: int = Field(default=3600, env="CACHE_TTL")  # 1 hour
+    incremental_state_limit: int = Field(default=1000, env="INCREMENTAL_STATE_LIMIT")  # users kept for re-plans
     
     # Monitoring and logging
     enable_metrics: bool = Field(default=True, env="ENABLE_METRICS")